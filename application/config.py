@@ -1,7 +1,88 @@
 import json
 import os
+import threading
+from datetime import datetime
+from types import MappingProxyType
+
+
+class ConfigSnapshot:
+    """
+    A frozen, parsed view of a configuration file.
+
+    Keys are flattened to their dotted paths once, so a lookup is a single dictionary access, and each
+    typed accessor caches its converted value. Take a new snapshot to see later changes to the file.
+    """
+    __slots__ = ("_values", "_cache")
+
+    def __init__(self, config: dict):
+        """
+        :param config: The parsed configuration dictionary. It is copied, not referenced.
+        """
+        values = {}
+        self._flatten(config, "", values)
+        object.__setattr__(self, "_values", MappingProxyType(values))
+        object.__setattr__(self, "_cache", {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot is immutable.")
+
+    @classmethod
+    def _flatten(cls, data: dict, prefix: str, out: dict) -> None:
+        for key, value in data.items():
+            path = f"{prefix}{key}"
+            if isinstance(value, dict):
+                cls._flatten(value, f"{path}.", out)
+            else:
+                out[path] = value
+
+    def _get(self, key, kind, convert):
+        try:
+            return self._cache[(kind, key)]
+        except KeyError:
+            pass
+        if key not in self._values:
+            raise ValueError(f"ERROR: Invalid settings for {key}.")
+        try:
+            value = convert(self._values[key])
+        except (TypeError, ValueError):
+            raise ValueError(f"ERROR: Setting {key} is not a valid {kind}.")
+        self._cache[(kind, key)] = value
+        return value
+
+    def get_str(self, key) -> str:
+        """Get a value as a string, like Config.get_value."""
+        return self._get(key, "str", str)
+
+    def get_float(self, key) -> float:
+        """Get a value as a float."""
+        return self._get(key, "float", float)
+
+    def get_int(self, key) -> int:
+        """Get a value as an integer."""
+        return self._get(key, "int", int)
+
+    def get_datetime(self, key) -> datetime:
+        """Get an ISO formatted value as a datetime."""
+        return self._get(key, "datetime", lambda v: datetime.fromisoformat(str(v)))
+
+    def get_bool(self, key) -> bool:
+        """Get a value as a boolean. Accepts JSON booleans, and the strings "true" and "false" in any case."""
+        return self._get(key, "bool", _to_bool)
+
+
+def _to_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in ("true", "false"):
+        return str(value).lower() == "true"
+    raise ValueError(value)
+
 
 class Config:
+    # Process-wide instances handed out by Config.shared(), keyed by absolute path.
+    _shared = {}
+    _shared_lock = threading.Lock()
+
     def __init__(self, file_path):
         """
         Initialize the Config object.
@@ -11,6 +92,45 @@ class Config:
 
         self.file_path = file_path
         self.config = self.load_config()
+        self.mtime = self._file_mtime()
+        self._snapshot = None
+
+    @classmethod
+    def shared(cls, file_path) -> "Config":
+        """
+        Get the process-wide Config for a file, creating it on first use.
+        The file is only parsed again if its modification time has changed since it was last read.
+
+        :param file_path: Path the the JSON configuration file.
+        """
+        key = os.path.abspath(file_path)
+        with cls._shared_lock:
+            config = cls._shared.get(key)
+            if config is None:
+                config = cls._shared[key] = cls(key)
+            else:
+                config.reload_if_changed()
+        return config
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.file_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reload the configuration file if it has changed on disk.
+
+        :return: True if the file was reloaded.
+        """
+        mtime = self._file_mtime()
+        if mtime == self.mtime:
+            return False
+        self.config = self.load_config()
+        self.mtime = self._file_mtime()
+        self._snapshot = None
+        return True
 
     def load_config(self):
         """Load the configuration file."""
@@ -31,10 +151,37 @@ class Config:
                 json.dump({}, file)
             return {}
 
+    def snapshot(self) -> ConfigSnapshot:
+        """
+        Get a frozen, parsed snapshot of the configuration, with typed and cached accessors.
+        The snapshot is rebuilt only after the configuration changes.
+        """
+        if self._snapshot is None:
+            self._snapshot = ConfigSnapshot(self.config)
+        return self._snapshot
+
+    def get_float(self, key) -> float:
+        """Get the value of a key as a float. Cached; see snapshot()."""
+        return self.snapshot().get_float(key)
+
+    def get_int(self, key) -> int:
+        """Get the value of a key as an integer. Cached; see snapshot()."""
+        return self.snapshot().get_int(key)
+
+    def get_datetime(self, key) -> datetime:
+        """Get the ISO formatted value of a key as a datetime. Cached; see snapshot()."""
+        return self.snapshot().get_datetime(key)
+
+    def get_bool(self, key) -> bool:
+        """Get the value of a key as a boolean. Cached; see snapshot()."""
+        return self.snapshot().get_bool(key)
+
     def save_config(self):
         """Save the configuration file."""
+        self._snapshot = None
         with open(self.file_path, 'w') as configFile:
             json.dump(self.config, configFile, indent=4)
+        self.mtime = self._file_mtime()
         
     def _navigate_to_key(self, key_path, create_missing=False):
         """
@@ -1,10 +1,63 @@
 import logging
 import json
 import sys
+import atexit
+import queue
+import threading
 from datetime import datetime
 from logging.handlers import RotatingFileHandler
 import os
 
+from .profiler import phase
+
+class LazyPayload:
+    """
+    A log payload that is only built if the record is going to be handled.
+
+    Pass one in place of the message dict, e.g. logger.debug(lazy(lambda: {...})). If the logger's level
+    filters the record out, the builder is never called, so f-strings and str(ndarray) calls cost nothing.
+    """
+    __slots__ = ("build",)
+
+    def __init__(self, build):
+        """
+        :param build: Zero-argument callable returning the message dict.
+        """
+        self.build = build
+
+
+def lazy(build) -> LazyPayload:
+    """Wrap a message builder in a LazyPayload."""
+    return LazyPayload(build)
+
+
+class LazyResolver(logging.Filter):
+    """Logger-level filter that builds lazy payloads before any handler filter or formatter sees them."""
+    def filter(self, record):
+        if isinstance(record.msg, LazyPayload):
+            with phase("logging"):
+                record.msg = record.msg.build()
+        return True
+
+
+class Sampler:
+    """
+    Cheap gate for per-step log records. Calling it returns True once every 'every' calls.
+    """
+    __slots__ = ("every", "count")
+
+    def __init__(self, every: int = 1):
+        self.every = max(int(every), 1)
+        self.count = 0
+
+    def __call__(self) -> bool:
+        self.count += 1
+        if self.count >= self.every:
+            self.count = 0
+            return True
+        return False
+
+
 class JsonFormatter(logging.Formatter):
     def format(self,record):
         log_record = {
@@ -14,7 +67,7 @@ class JsonFormatter(logging.Formatter):
             "function": record.funcName,
         }
         if isinstance(record.msg, dict):
-            log_record.update({k: v for k, v in record.msg.items() if k in ("sim_time", "step", "run_id", "data", "event")})
+            log_record.update({k: v for k, v in record.msg.items() if k in ("sim_time", "step", "run_id", "victim", "data", "event")})
         return json.dumps(log_record)
 
 class MessageFormatter(logging.Formatter):
@@ -23,11 +76,160 @@ class MessageFormatter(logging.Formatter):
              return f"\033[1;31m[{record.levelname}]\033[0m \033[33m{record.name}\033[0m \033[94m{record.funcName}\033[0m - {record.msg.get('message', '')}"
         return super().format(record)
 
+class BatchRotatingFileHandler(RotatingFileHandler):
+    """
+    A RotatingFileHandler that can write a batch of records with a single flush.
+    Single records, written synchronously, are timed as the "logging" phase of the active TickProfiler.
+    """
+    def emit(self, record):
+        with phase("logging"):
+            super().emit(record)
+
+    def emit_batch(self, records) -> None:
+        self.acquire()
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            for record in records:
+                try:
+                    msg = self.format(record) + self.terminator
+                    if self.maxBytes > 0 and self.stream.tell() + len(msg) >= self.maxBytes:
+                        self.doRollover()
+                        if self.stream is None:
+                            self.stream = self._open()
+                    self.stream.write(msg)
+                except Exception:
+                    self.handleError(record)
+            self.stream.flush()
+        finally:
+            self.release()
+
+
+class LogWriter:
+    """
+    Background writer shared by every Logger.
+
+    The simulation thread only puts records on a bounded queue; one listener thread takes them off in
+    batches and writes each batch with a single flush per file. When the queue is full, the producer
+    blocks until the writer catches up. Pending records are written at interpreter exit.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+    _STOP = object()
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 512):
+        """
+        :param max_queue: Maximum number of queued records before producers block.
+        :param batch_size: Maximum number of records written per batch.
+        """
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self._start()
+        atexit.register(self.stop)
+
+    def _start(self) -> None:
+        self.queue = queue.Queue(maxsize=self.max_queue)
+        self.thread = threading.Thread(target=self._run, name="LogWriter", daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def _after_fork(cls) -> None:
+        # A forked child, such as a batch worker, inherits the queue but not the writer thread. Records queued
+        # before the fork belong to the parent; the child starts an empty queue and its own thread.
+        cls._instance_lock = threading.Lock()
+        if cls._instance is not None:
+            cls._instance._start()
+
+    @classmethod
+    def get(cls) -> "LogWriter":
+        """Get the process-wide writer, starting it on first use."""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def put(self, handler, record) -> None:
+        self.queue.put((handler, record))
+
+    def _run(self) -> None:
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            by_handler = {}
+            for item in batch:
+                if item is LogWriter._STOP:
+                    running = False
+                else:
+                    by_handler.setdefault(item[0], []).append(item[1])
+            for handler, records in by_handler.items():
+                handler.emit_batch(records)
+            for _ in batch:
+                self.queue.task_done()
+
+    def flush(self) -> None:
+        """Block until every queued record has been written."""
+        if self.thread.is_alive():
+            self.queue.join()
+
+    def stop(self) -> None:
+        """Write every pending record, then stop the writer thread."""
+        if self.thread.is_alive():
+            self.queue.put(LogWriter._STOP)
+            self.thread.join()
+
+
+os.register_at_fork(after_in_child=LogWriter._after_fork)
+
+
+class ConsoleHandler(logging.StreamHandler):
+    """
+    StreamHandler whose writes are timed as the "logging" phase of the active TickProfiler.
+    """
+    def emit(self, record):
+        with phase("logging"):
+            super().emit(record)
+
+
+class QueuedHandler(logging.Handler):
+    """
+    Hands records to the shared LogWriter instead of writing them on the calling thread.
+    Filters on this handler run on the calling thread, so rejected records are never queued.
+    """
+    def __init__(self, target: BatchRotatingFileHandler):
+        super().__init__(target.level)
+        self.target = target
+        self.writer = LogWriter.get()
+
+    def emit(self, record):
+        with phase("logging"):
+            self.writer.put(self.target, record)
+
+    def flush(self):
+        self.writer.flush()
+
+
 class Logger:
-    def __init__(self, name, run_id=None, file_prefix=None, log_dir="logs", level=logging.DEBUG, file_max_bytes=10*1024*1024, backup_count=20):
+    # Default level and write mode for new loggers, and the names of every logger created here. See configure().
+    level = logging.DEBUG
+    async_writes = False
+    _names = set()
+
+    def __init__(self, name, run_id=None, file_prefix=None, log_dir="logs", level=None, file_max_bytes=10*1024*1024, backup_count=20, async_writes=None):
         self.logger = logging.getLogger(name)
-        self.logger.setLevel(level)
+        self.logger.setLevel(Logger.level if level is None else level)
         self.logger.propagate=False
+        if name in Logger._names and self.logger.handlers:
+            # Already set up by an earlier Logger, e.g. a log stream shared by many victims.
+            self.run_id = run_id
+            return
+        self.logger.addFilter(LazyResolver())
+        Logger._names.add(name)
 
         if run_id is None:
             run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -45,13 +247,16 @@ class Logger:
 
         print(f"Object: {name}, File: {file_prefix}")
 
-        file_handler=RotatingFileHandler(full_path, maxBytes=file_max_bytes, backupCount=backup_count, delay=True)
+        file_handler=BatchRotatingFileHandler(full_path, maxBytes=file_max_bytes, backupCount=backup_count, delay=True)
         file_handler.setFormatter(JsonFormatter())
         file_handler.setLevel(logging.DEBUG)
+        if Logger.async_writes if async_writes is None else async_writes:
+            # File I/O and JSON encoding happen on the LogWriter thread.
+            file_handler = QueuedHandler(file_handler)
         file_handler.addFilter(lambda record: isinstance(record.msg, dict) and "event" in record.msg)
         self.logger.addHandler(file_handler)
 
-        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler = ConsoleHandler(sys.stdout)
         stream_handler.setFormatter(MessageFormatter())
         stream_handler.setLevel(logging.INFO)
         stream_handler.addFilter(lambda record: isinstance(record.msg, dict) and "message" in record.msg)
@@ -59,3 +264,48 @@ class Logger:
 
     def get(self):
         return self.logger
+
+    def enabled(self, level=logging.DEBUG) -> bool:
+        """Cheap check for whether a record at 'level' would be handled."""
+        return self.logger.isEnabledFor(level)
+
+    @staticmethod
+    def flush() -> None:
+        """Block until every queued log record has been written to disk."""
+        if LogWriter._instance is not None:
+            LogWriter._instance.flush()
+
+    @classmethod
+    def configure(cls, level, async_writes=None) -> None:
+        """
+        Set the level and write mode of every logger created so far, and the defaults for new ones.
+
+        :param level: A logging level, as an int or a name such as "INFO".
+        :param async_writes: If True, file records are written by the background LogWriter thread; if False, on the
+                             calling thread. None leaves the write mode unchanged.
+        """
+        if isinstance(level, str):
+            level = logging.getLevelNamesMapping()[level.upper()]
+        cls.level = level
+        for name in cls._names:
+            logging.getLogger(name).setLevel(level)
+        if async_writes is not None and bool(async_writes) != cls.async_writes:
+            cls.async_writes = bool(async_writes)
+            for name in cls._names:
+                cls._set_async(logging.getLogger(name), cls.async_writes)
+
+    @staticmethod
+    def _set_async(logger, enabled: bool) -> None:
+        # Swap each file handler between its synchronous and queued form, keeping the same file.
+        for handler in list(logger.handlers):
+            if enabled and isinstance(handler, BatchRotatingFileHandler):
+                replacement = QueuedHandler(handler)
+            elif not enabled and isinstance(handler, QueuedHandler):
+                handler.flush()
+                replacement = handler.target
+            else:
+                continue
+            replacement.filters = handler.filters
+            handler.filters = []
+            logger.removeHandler(handler)
+            logger.addHandler(replacement)
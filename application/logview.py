@@ -8,7 +8,7 @@ class Logview(tk.Tk):
         self.title("Log Viewer")
         self.geometry("800x600")
 
-        self.fixed_columns = ["timestamp", "level", "module", "function", "event", "step", "data"]
+        self.fixed_columns = ["timestamp", "level", "module", "function", "victim", "event", "step", "data"]
         self.column_filters = {}
 
         # Top controls: Choose directory and search filter
@@ -0,0 +1,168 @@
+import csv
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+
+class _Phase:
+    """Reusable context manager for one phase of a TickProfiler, so entering a phase allocates nothing."""
+    __slots__ = ("profiler", "index")
+
+    def __init__(self, profiler: "TickProfiler", index: int):
+        self.profiler = profiler
+        self.index = index
+
+    def __enter__(self):
+        self.profiler._enter(self.index)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler._exit()
+
+
+_NULL = nullcontext()
+
+
+class TickProfiler:
+    """
+    Wall time per simulation tick, split into phases.
+
+    Phases nest, and timing is exclusive: time is always charged to the innermost open phase, so an interpolation
+    inside the victim physics counts as interpolation only, and the phases of a tick add up to at most its length.
+    Whatever is left is reported as "other".
+
+    A tick runs from one StartTick to the next (or to Finish), so work done between ticks, such as drawing the
+    frame of an animation, belongs to the tick before it.
+
+    The profiler that most recently started a tick is the process' active one. Code that cannot see the simulation,
+    such as the environment and the logger, marks its phases with the module-level 'phase' function, which does
+    nothing when no profiler is active, or on any thread but the one that started the tick.
+    """
+    PHASES = ("refresh", "interpolation", "physics", "logging", "artists", "draw")
+    STATISTICS = ("total", "mean", "p50", "p90", "p99", "max", "share")
+    _active: Optional["TickProfiler"] = None
+
+    def __init__(self, enabled: bool = True) -> None:
+        """
+        :param enabled: If False, no tick is ever started, so nothing is recorded.
+        """
+        self.enabled = enabled
+        self._phases = {name: _Phase(self, i) for i, name in enumerate(self.PHASES)}
+        self._current = [0.0] * len(self.PHASES)
+        self._stack: List[int] = []
+        self._since = 0.0
+        self._tick_start = None
+        self._thread = None
+        self.ticks: List[List[float]] = []  # Per tick: its length, then each phase.
+
+    def Phase(self, name: str):
+        """
+        Context manager timing a block as one phase of the current tick. Does nothing between ticks.
+
+        :param name: One of PHASES.
+        """
+        return _NULL if self._tick_start is None else self._phases[name]
+
+    def _enter(self, index: int) -> None:
+        now = time.perf_counter()
+        if self._stack:
+            self._current[self._stack[-1]] += now - self._since
+        self._stack.append(index)
+        self._since = now
+
+    def _exit(self) -> None:
+        now = time.perf_counter()
+        self._current[self._stack.pop()] += now - self._since
+        self._since = now
+
+    def StartTick(self) -> None:
+        """
+        Closes the previous tick, if any, starts a new one, and makes this the active profiler.
+        """
+        if not self.enabled:
+            return
+        self._close_tick()
+        TickProfiler._active = self
+        self._thread = threading.get_ident()
+        self._tick_start = time.perf_counter()
+
+    def _close_tick(self) -> None:
+        if self._tick_start is None:
+            return
+        now = time.perf_counter()
+        if self._stack:
+            # A phase still open at the end of a tick, e.g. after an exception, is charged up to here.
+            self._current[self._stack[-1]] += now - self._since
+            self._since = now
+        self.ticks.append([now - self._tick_start] + self._current)
+        self._current = [0.0] * len(self.PHASES)
+        self._tick_start = None
+
+    def Finish(self) -> None:
+        """
+        Closes the last tick. If this is the active profiler, there is no longer one.
+        """
+        self._close_tick()
+        if TickProfiler._active is self:
+            TickProfiler._active = None
+
+    def Summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Statistics of every phase over the recorded ticks, in seconds per tick.
+
+        :return: Dictionary of "tick", each phase and "other" to a dictionary of total, mean, p50, p90, p99 and max
+                 seconds, and share of the total time. Empty if no tick was recorded.
+        """
+        import numpy as np  # The logger imports this module, and should not need numpy.
+
+        if not self.ticks:
+            return {}
+        ticks = np.asarray(self.ticks)
+        columns = {"tick": ticks[:, 0]}
+        columns.update({name: ticks[:, i+1] for i, name in enumerate(self.PHASES)})
+        columns["other"] = np.maximum(ticks[:, 0] - ticks[:, 1:].sum(axis=1), 0.0)
+        total = ticks[:, 0].sum()
+        summary = {}
+        for name, values in columns.items():
+            p50, p90, p99 = np.percentile(values, (50, 90, 99))
+            summary[name] = {"total": float(values.sum()), "mean": float(values.mean()), "p50": float(p50), "p90": float(p90),
+                             "p99": float(p99), "max": float(values.max()), "share": float(values.sum() / total) if total > 0 else 0.0}
+        return summary
+
+    def Save(self, path: str) -> str:
+        """
+        Writes the summary to a file: a JSON object, with the tick count, if the path ends in .json, otherwise a CSV
+        table with one row per phase.
+
+        :param path: Output file.
+        :return: The path written to.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        summary = self.Summary()
+        with open(path, "w", newline="") as file:
+            if path.endswith(".json"):
+                json.dump({"ticks": len(self.ticks), "phases": summary}, file, indent=4)
+            else:
+                writer = csv.writer(file)
+                writer.writerow(("phase",) + self.STATISTICS)
+                for name, stats in summary.items():
+                    writer.writerow([name] + [stats[key] for key in self.STATISTICS])
+        return path
+
+
+def phase(name: str):
+    """
+    Context manager timing a block as one phase of the active TickProfiler's current tick. Does nothing if no
+    profiler is active.
+
+    :param name: One of TickProfiler.PHASES.
+    """
+    profiler = TickProfiler._active
+    if profiler is None or profiler._thread != threading.get_ident():
+        return _NULL
+    return profiler._phases[name]
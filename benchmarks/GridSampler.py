@@ -0,0 +1,84 @@
+"""
+Field sampling benchmark: UniformGridSampler against scipy's RegularGridInterpolator.
+
+Both sample a synthetic (time, lat, lon, 2) float32 field on a 1/12 degree grid, the Copernicus current grid, at
+the same random points and times. Reports the best time per call for each number of points, the speedup, and the
+largest difference between the two. Exits with status 1 if they disagree by more than the tolerance.
+
+Run from the project root: python benchmarks/GridSampler.py [--points 1 10 100 1000 10000 100000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from scipy.interpolate import RegularGridInterpolator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from simulation.GridSampler import UniformGridSampler
+
+
+def best_time(function, repeat: int) -> float:
+    """
+    Best wall time of one call, in seconds. Fast calls are looped so each timing lasts at least 10 ms.
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        if time.perf_counter() - start >= 0.01:
+            break
+        loops *= 10
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        times.append((time.perf_counter() - start) / loops)
+    return min(times)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, nargs="+", default=[1, 10, 100, 1000, 10000, 100000], help="Points per call.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timings per case. The best is reported.")
+    parser.add_argument("--records", type=int, default=48, help="Time records in the field.")
+    parser.add_argument("--degrees", type=float, default=4.0, help="Width and height of the field, in degrees.")
+    parser.add_argument("--tolerance", type=float, default=1e-6, help="Largest allowed difference from scipy.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    step = 1 / 12
+    times = np.arange(args.records) * 3600.0
+    lats = 30.0 + np.arange(int(args.degrees / step) + 1) * step
+    lons = -80.0 + np.arange(int(args.degrees / step) + 1) * step
+    values = rng.normal(size=(times.size, lats.size, lons.size, 2)).astype(np.float32)
+
+    sampler = UniformGridSampler(times, lats, lons, values)
+    scipy = RegularGridInterpolator((times, lats, lons), values, bounds_error=False, fill_value=None)
+    print(f"Field of {times.size} x {lats.size} x {lons.size} x 2, {values.nbytes / 1e6:.1f} MB.")
+    print(f"{'points':>8s} {'scipy':>12s} {'uniform':>12s} {'speedup':>8s} {'max diff':>10s}")
+
+    failed = False
+    for n in args.points:
+        points_lat = rng.uniform(lats[0], lats[-1], n)
+        points_lon = rng.uniform(lons[0], lons[-1], n)
+        t = float(rng.uniform(times[0], times[-1]))
+        if n == 1:
+            # Single queries pass scalars, as Environment.Query does.
+            points_lat, points_lon = float(points_lat[0]), float(points_lon[0])
+
+        difference = float(np.abs(sampler.Sample(t, points_lat, points_lon) - scipy((t, points_lat, points_lon))).max())
+        failed |= difference > args.tolerance
+        slow = best_time(lambda: scipy((t, points_lat, points_lon)), args.repeat)
+        fast = best_time(lambda: sampler.Sample(t, points_lat, points_lon), args.repeat)
+        print(f"{n:8d} {slow * 1e6:9.1f} us {fast * 1e6:9.1f} us {slow / fast:7.1f}x {difference:10.2e}")
+    if failed:
+        print(f"FAIL: samplers differ by more than {args.tolerance}.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Import-time benchmark for the simulation package.
+
+Imports each module in a fresh interpreter with 'python -X importtime', and reports the best cumulative import time
+over several runs, the slowest dependencies, and whether any module that should be deferred was imported.
+Exits with status 1 if a deferred module is imported, or if a module is over the time budget.
+
+Run from the project root: python benchmarks/ImportTime.py [--repeat 5] [--budget 2.0]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules worker processes and headless runs import.
+MODULES = ("simulation.Environment", "simulation.VictimEnsemble", "simulation.Simulation", "simulation.BatchRunner")
+
+# Imported only where they are needed: drawing, and downloading data.
+DEFERRED = ("matplotlib", "cartopy", "copernicusmarine")
+
+
+def import_times(module: str, cwd: str):
+    """
+    Imports a module in a new interpreter.
+
+    :return: Dictionary of every imported module to its cumulative import time, in seconds.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=cwd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per module. The best is reported.")
+    parser.add_argument("--budget", type=float, default=None, help="Maximum import time per module, in seconds.")
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest third-party packages to list.")
+    args = parser.parse_args()
+
+    failed = False
+    # Modules create their log files on import, so run somewhere they can be thrown away.
+    with tempfile.TemporaryDirectory() as cwd:
+        for module in MODULES:
+            runs = [import_times(module, cwd) for _ in range(max(args.repeat, 1))]
+            best = min(runs, key=lambda times: times[module])
+            total = best[module]
+            deferred = sorted({name.split(".")[0] for name in best if name.split(".")[0] in DEFERRED})
+
+            status = "ok"
+            if deferred:
+                status = f"FAIL: imports {', '.join(deferred)}"
+            elif args.budget is not None and total > args.budget:
+                status = f"FAIL: over budget of {args.budget:.2f} s"
+            failed |= status != "ok"
+
+            print(f"{module:28s} {total:7.3f} s   {status}")
+            packages = {}
+            for name, t in best.items():
+                root = name.split(".")[0]
+                if root not in ("simulation", "application"):
+                    packages[root] = max(packages.get(root, 0.0), t)
+            for name, t in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+                print(f"    {name:24s} {t:7.3f} s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
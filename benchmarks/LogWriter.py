@@ -0,0 +1,87 @@
+"""
+Log writing benchmark: simulation ticks with synchronous log writes against the background LogWriter thread.
+
+Writes synthetic datasets (see SyntheticData.py) to a temporary project directory, then runs a simulation of
+individual victims at the DEBUG level, so every victim sub-step writes a record, once with
+'application.logging.async_writes' off and once on, alternating for --repeat runs each. Reports the mean and 90th
+percentile tick time, the share of it spent in the "logging" profiler phase, and the time Logger.flush() takes after
+the last tick to write what is still queued. Set 'application.logging.async_writes' from these numbers: the thread
+only pays off if its ticks are shorter by more than the flush.
+
+Run from the project root: python benchmarks/LogWriter.py [--victims 5] [--ticks 10] [--repeat 2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.SyntheticData import settings_copy, working_directory, write_datasets
+
+CENTER = (30.0, -78.0)
+START = datetime(2023, 1, 1)
+
+
+def run_once(config: str, victims: int, ticks: int) -> dict:
+    """
+    Times one simulation run.
+
+    :return: Dictionary of per-tick times, the logging phase share, and the final flush time, in seconds.
+    """
+    from application.logger import Logger
+    from application.profiler import TickProfiler
+    from simulation.Simulation import Simulation
+    from simulation.Victim import Victim
+
+    end = START + timedelta(minutes=10 * (ticks + 1))
+    sim = Simulation(*CENTER, config, START, end)
+    sim.profiler = TickProfiler(True)
+    rng = np.random.default_rng(0)
+    for i in range(victims):
+        sim._add_victim(Victim(0.5, 0.5, 1, CENTER[0] + rng.uniform(-0.2, 0.2), CENTER[1] + rng.uniform(-0.2, 0.2), "piw", sim.env, config, i))
+    for _ in range(ticks):
+        sim.Tick()
+    sim.profiler.Finish()
+    start = time.perf_counter()
+    Logger.flush()
+    flush = time.perf_counter() - start
+    sim.Close()
+    summary = sim.profiler.Summary()
+    return {"ticks": [tick[0] for tick in sim.profiler.ticks], "logging": summary["logging"]["share"], "flush": flush}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--victims", type=int, default=5, help="Individual victims.")
+    parser.add_argument("--ticks", type=int, default=10, help="Ticks per run.")
+    parser.add_argument("--repeat", type=int, default=2, help="Runs per mode.")
+    parser.add_argument("--log-level", default="DEBUG", help="Logging level.")
+    parser.add_argument("--sample-every", type=int, default=1, help="'application.logging.sample_every'.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as project:
+        config_path = write_datasets(project, days=2, start=START)
+        configs = {mode: settings_copy(config_path, {"application.logging.async_writes": mode == "async", "application.logging.level": args.log_level,
+                                                     "application.logging.sample_every": args.sample_every}) for mode in ("sync", "async")}
+        with working_directory(project):
+            runs = {"sync": [], "async": []}
+            for _ in range(args.repeat):
+                for mode, config in configs.items():
+                    runs[mode].append(run_once(config, args.victims, args.ticks))
+
+    print(f"{args.victims} victims, {args.ticks} ticks, level {args.log_level}, {args.repeat} runs per mode.")
+    print(f"{'mode':>6s} {'mean tick':>12s} {'p90 tick':>12s} {'logging':>8s} {'flush':>10s}")
+    for mode, results in runs.items():
+        ticks = np.concatenate([r["ticks"] for r in results])
+        logging = np.mean([r["logging"] for r in results])
+        flush = np.mean([r["flush"] for r in results])
+        print(f"{mode:>6s} {ticks.mean() * 1e3:9.2f} ms {np.percentile(ticks, 90) * 1e3:9.2f} ms {logging:7.1%} {flush * 1e3:7.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
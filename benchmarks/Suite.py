@@ -0,0 +1,168 @@
+"""
+Benchmark suite for the simulation, on synthetic datasets, with no network.
+
+Writes synthetic current, wind and depth files (see SyntheticData.py) to a temporary project directory, then times:
+- Environment.__init__: opening the datasets and preloading a one day window.
+- Environment.Query: one point query.
+- Victim.Update: one tick of every victim, for each victim count.
+- Simulation.Tick: one tick of a simulation of individual victims, and of the same number in a VictimEnsemble.
+- Visualizer.update: one animation frame, which includes a tick. With --draw the figure is also rendered, which
+  needs Cartopy's Natural Earth coastlines to be installed or downloadable.
+Each is run for every domain size (the margin around the center, in miles), and reports the best of --repeat runs.
+
+Log files are written to the temporary directory. The default level is WARNING, so the numbers measure the simulation
+rather than log I/O; use --log-level DEBUG to include the logging of a default configuration (it is much slower).
+
+Run from the project root: python benchmarks/Suite.py [--margins 10 50 150] [--victims 1 10 100] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.SyntheticData import settings_copy, working_directory, write_datasets
+
+# Offshore of the synthetic coastline, and far enough inside the data for the largest default margin.
+CENTER = (30.0, -78.0)
+START = datetime(2023, 1, 1)
+END = START + timedelta(days=1)
+
+
+def best_time(function: Callable[[], None], repeat: int) -> float:
+    """
+    Best wall time of one call, in seconds.
+
+    :param function: Function to time.
+    :param repeat: Number of timed calls.
+    """
+    times = []
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def spawn(env, count: int, rng: np.random.Generator):
+    """
+    Random start positions within a tenth of the environment bounds around the center.
+    """
+    lat_min, lat_max, lon_min, lon_max = env.bounds
+    lats = CENTER[0] + rng.uniform(-0.1, 0.1, count) * (lat_max - lat_min)
+    lons = CENTER[1] + rng.uniform(-0.1, 0.1, count) * (lon_max - lon_min)
+    return lats, lons
+
+
+def run(config_path: str, margins: List[float], victims: List[int], repeat: int, queries: int, draw: bool, log_level: str) -> List[dict]:
+    import matplotlib.pyplot as plt
+    from application.logger import Logger
+    from simulation.Environment import Environment
+    from simulation.Simulation import Simulation
+    from simulation.Victim import Victim
+    from simulation.VictimEnsemble import VictimEnsemble
+
+    # Simulation sets the level when it is created. Set it first, so the environment and victim cases match.
+    Logger.configure(log_level)
+    results = []
+
+    def report(name: str, margin: float, grid, count: int, seconds: float, per: str) -> None:
+        results.append({"benchmark": name, "margin_miles": margin, "grid": list(grid), "victims": count, "seconds": seconds, "per": per})
+        label = f"{name} x{count}" if count else name
+        print(f"{label:34s} {margin:6g} mi {f'{grid[0]}x{grid[1]}':>9s} {seconds * 1e3:12.3f} ms/{per}", flush=True)
+
+    for margin in margins:
+        # Simulation takes no margin, so each domain size gets its own settings file.
+        config = settings_copy(config_path, {"environment.settings.default_window_margin": margin, "application.logging.level": log_level})
+        rng = np.random.default_rng(0)
+
+        envs = []
+        seconds = best_time(lambda: envs.append(Environment(*CENTER, config, date=START, end_date=END)), repeat)
+        for env in envs[1:]:
+            env.Close()
+        env = envs[0]
+        grid = env.window.current.values.shape[1:3]
+        report("Environment.__init__", margin, grid, 0, seconds, "call")
+
+        lats, lons = spawn(env, queries, rng)
+        points = list(zip(lats.tolist(), lons.tolist()))
+        seconds = best_time(lambda: [env.Query(lat, lon) for lat, lon in points], repeat)
+        report("Environment.Query", margin, grid, 0, seconds / queries, "call")
+
+        for count in victims:
+            lats, lons = spawn(env, count, rng)
+            group = [Victim(0.5, 0.5, 1, lat, lon, "piw", env, config, i) for i, (lat, lon) in enumerate(zip(lats, lons))]
+            seconds = best_time(lambda: [v.Update(1) for v in group], repeat)
+            report("Victim.Update", margin, grid, count, seconds, "tick")
+        env.Close()
+
+        for count in victims:
+            sim = Simulation(*CENTER, config, START, END)
+            lats, lons = spawn(sim.env, count, rng)
+            for i, (lat, lon) in enumerate(zip(lats, lons)):
+                sim._add_victim(Victim(0.5, 0.5, 1, lat, lon, "piw", sim.env, config, i))
+            report("Simulation.Tick", margin, grid, count, best_time(sim.Tick, repeat), "tick")
+            sim.Close()
+
+            sim = Simulation(*CENTER, config, START, END)
+            lats, lons = spawn(sim.env, count, rng)
+            sim._add_ensemble(VictimEnsemble(np.full(count, 0.5), np.full(count, 0.5), np.ones(count), lats, lons, ["piw"] * count, sim.env, config))
+            report("Simulation.Tick (ensemble)", margin, grid, count, best_time(sim.Tick, repeat), "tick")
+            sim.Close()
+
+        for count in victims:
+            sim = Simulation(*CENTER, config, START, END)
+            lats, lons = spawn(sim.env, count, rng)
+            for i, (lat, lon) in enumerate(zip(lats, lons)):
+                sim._add_victim(Victim(0.5, 0.5, 1, lat, lon, "piw", sim.env, config, i))
+            vis = sim.vis
+            vis.plot(0)
+            frames = iter(range(1, sim.simulation_steps + 1))
+
+            def frame():
+                vis.update(next(frames))
+                if draw:
+                    vis.fig.canvas.draw()
+            report("Visualizer.update", margin, grid, count, best_time(frame, repeat), "frame")
+            plt.close(vis.fig)
+            sim.Close()
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--margins", type=float, nargs="+", default=[10, 50, 150], help="Domain sizes: margin around the center, in miles.")
+    parser.add_argument("--victims", type=int, nargs="+", default=[1, 10, 100], help="Victim counts.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case. The best is reported.")
+    parser.add_argument("--queries", type=int, default=1000, help="Points per Environment.Query run.")
+    parser.add_argument("--draw", action="store_true", help="Render the figure in Visualizer.update.")
+    parser.add_argument("--log-level", default="WARNING", help="Logging level.")
+    parser.add_argument("--output", default=None, help="Write the results to a JSON file.")
+    args = parser.parse_args()
+
+    import matplotlib
+    matplotlib.use("Agg")
+
+    output = os.path.abspath(args.output) if args.output else None
+    with tempfile.TemporaryDirectory() as project:
+        config_path = write_datasets(project, days=2, start=START)
+        with working_directory(project):
+            results = run(config_path, args.margins, args.victims, args.repeat, args.queries, args.draw, args.log_level)
+
+    if output:
+        with open(output, "w") as file:
+            json.dump({"date": datetime.now().isoformat(), "python": platform.python_version(), "machine": platform.machine(),
+                       "processor": platform.processor(), "results": results}, file, indent=4)
+        print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+Synthetic stand-ins for the Copernicus current, wind and depth datasets, for benchmarks on machines with no network.
+
+Writes current.nc, wind.nc and depth.nc with the variables, dimensions, grids and time steps of the products the
+fetchers download:
+- current: uo, vo on (time, depth, latitude, longitude), daily, 1/12 degree, one surface depth level.
+- wind: the six wind variables on (time, latitude, longitude), hourly, 0.125 degree.
+- depth: deptho and mask on (latitude, longitude), 1/12 degree.
+
+The fields are smooth and vary in time: a coastline along the western edge with NaN over land, a slope from the
+shelf to the deep ocean, a northward jet over the slope with a slow eddy field, and a weather pattern that rotates
+the wind over a few days. The values are not real, but are of realistic size, so the drift physics does the same work.
+
+A settings file next to the data points the application at it, with 'application.data.offline' set, so nothing is
+ever downloaded.
+
+'settings_copy', 'working_directory' and 'uniform_window' are the settings, working directory and forcing
+fixtures shared by the tests and benchmarks.
+
+Run from the project root: python benchmarks/SyntheticData.py DIRECTORY [--days 3] [--seed 0]
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Optional, Tuple
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Grid spacings and record intervals of the Copernicus products.
+CURRENT_STEP = 1 / 12
+WIND_STEP = 0.125
+CURRENT_FREQUENCY = "1D"
+WIND_FREQUENCY = "1h"
+
+
+def _axis(low: float, high: float, step: float) -> np.ndarray:
+    return np.round(low + np.arange(int(round((high - low) / step)) + 1) * step, 6)
+
+
+def _coast(lats: np.ndarray, lon_range: Tuple[float, float]) -> np.ndarray:
+    # Longitude of the coastline at each latitude: a wavy line in the western fifth of the box.
+    width = lon_range[1] - lon_range[0]
+    return lon_range[0] + width * (0.12 + 0.05 * np.sin(np.radians(lats) * 40))
+
+
+def _distance_offshore(lats: np.ndarray, lons: np.ndarray, lon_range: Tuple[float, float]) -> np.ndarray:
+    lon_grid, lat_grid = np.meshgrid(lons, lats)
+    return (lon_grid - _coast(lat_grid, lon_range)) * np.cos(np.radians(lat_grid))
+
+
+def depth_dataset(lat_range: Tuple[float, float], lon_range: Tuple[float, float]) -> xr.Dataset:
+    """
+    Static sea floor depth. Land is NaN in deptho and 0 in mask.
+    """
+    lats = _axis(*lat_range, CURRENT_STEP)
+    lons = _axis(*lon_range, CURRENT_STEP)
+    offshore = _distance_offshore(lats, lons, lon_range)
+    depth = 20 + 4980 / (1 + np.exp(-(offshore - 1.0) * 4))
+    ocean = offshore > 0
+    return xr.Dataset(
+        {"deptho": (("latitude", "longitude"), np.where(ocean, depth, np.nan).astype(np.float32), {"units": "m"}),
+         "mask": (("latitude", "longitude"), ocean.astype(np.int8))},
+        coords={"latitude": lats, "longitude": lons})
+
+
+def current_dataset(lat_range: Tuple[float, float], lon_range: Tuple[float, float], start: datetime, end: datetime, rng: np.random.Generator) -> xr.Dataset:
+    """
+    Daily surface currents: a northward jet over the continental slope, and a slowly drifting eddy field. NaN over land.
+    """
+    lats = _axis(*lat_range, CURRENT_STEP)
+    lons = _axis(*lon_range, CURRENT_STEP)
+    times = pd.date_range(start, end, freq=CURRENT_FREQUENCY)
+    offshore = _distance_offshore(lats, lons, lon_range)
+    lon_grid, lat_grid = np.meshgrid(lons, lats)
+    jet = 1.5 * np.exp(-((offshore - 1.0) / 0.4) ** 2)
+    phase = rng.uniform(0, 2 * np.pi, 2)
+
+    uo = np.empty((times.size, 1, lats.size, lons.size), dtype=np.float32)
+    vo = np.empty_like(uo)
+    for k in range(times.size):
+        drift = 0.05 * k  # Eddies move west about 5 km a day.
+        x = np.radians(lon_grid + drift) * 30 + phase[0]
+        y = np.radians(lat_grid) * 30 + phase[1]
+        uo[k, 0] = 0.25 * np.sin(x) * np.cos(y)
+        vo[k, 0] = jet - 0.25 * np.cos(x) * np.sin(y)
+    land = offshore <= 0
+    uo[:, :, land] = np.nan
+    vo[:, :, land] = np.nan
+    return xr.Dataset(
+        {"uo": (("time", "depth", "latitude", "longitude"), uo, {"units": "m s-1"}),
+         "vo": (("time", "depth", "latitude", "longitude"), vo, {"units": "m s-1"})},
+        coords={"time": times, "depth": np.array([0.494], dtype=np.float32), "latitude": lats, "longitude": lons})
+
+
+def wind_dataset(lat_range: Tuple[float, float], lon_range: Tuple[float, float], start: datetime, end: datetime, rng: np.random.Generator) -> xr.Dataset:
+    """
+    Hourly 10 m wind: a mean trade wind with a weather pattern that rotates over about three days, a diurnal sea
+    breeze near the coast, and some gustiness. Wind is defined over land too.
+    """
+    lats = _axis(*lat_range, WIND_STEP)
+    lons = _axis(*lon_range, WIND_STEP)
+    times = pd.date_range(start, end, freq=WIND_FREQUENCY)
+    offshore = _distance_offshore(lats, lons, lon_range)
+    lon_grid, lat_grid = np.meshgrid(lons, lats)
+    hours = (times - times[0]) / pd.Timedelta(hours=1)
+
+    shape = (times.size, lats.size, lons.size)
+    east = np.empty(shape, dtype=np.float32)
+    north = np.empty(shape, dtype=np.float32)
+    breeze = np.exp(-np.abs(offshore) / 0.3)
+    for k, h in enumerate(hours):
+        angle = 2 * np.pi * h / 72 + np.radians(lat_grid - lat_range[0]) * 5
+        sea_breeze = 3 * np.sin(2 * np.pi * (h - 9) / 24) * breeze
+        east[k] = -4 + 6 * np.cos(angle) - sea_breeze + rng.normal(0, 0.5, lat_grid.shape)
+        north[k] = 1 + 6 * np.sin(angle) + rng.normal(0, 0.5, lat_grid.shape)
+
+    # Bulk formula with a constant drag coefficient and air density.
+    speed = np.hypot(east, north)
+    stress = 1.2 * 1.3e-3 * speed
+    zeros = np.zeros(shape, dtype=np.float32)
+    dims = ("time", "latitude", "longitude")
+    return xr.Dataset(
+        {"eastward_wind": (dims, east, {"units": "m s-1"}),
+         "northward_wind": (dims, north, {"units": "m s-1"}),
+         "eastward_stress": (dims, (stress * east).astype(np.float32), {"units": "N m-2"}),
+         "northward_stress": (dims, (stress * north).astype(np.float32), {"units": "N m-2"}),
+         "wind_divergence": (dims, zeros, {"units": "s-1"}),
+         "wind_curl": (dims, zeros, {"units": "s-1"})},
+        coords={"time": times, "latitude": lats, "longitude": lons})
+
+
+def write_datasets(project_dir: str, days: int = 3, start: datetime = datetime(2023, 1, 1), seed: int = 0,
+                   lat_range: Optional[Tuple[float, float]] = None, lon_range: Optional[Tuple[float, float]] = None) -> str:
+    """
+    Writes the three datasets, and a settings file pointing at them.
+
+    :param project_dir: Directory to write to. Used as 'application.settings.project_dir'; the data goes in its
+                        'application.data.storage' subdirectory.
+    :param days: Number of days of current and wind data.
+    :param start: First record time.
+    :param seed: Seed for the random parts of the fields.
+    :param lat_range: (min, max) latitude. Defaults to 'environment.settings' in resources/settings.json.
+    :param lon_range: (min, max) longitude. Defaults to 'environment.settings' in resources/settings.json.
+    :return: Absolute path of the settings file.
+    """
+    with open(os.path.join(ROOT, "resources", "settings.json")) as file:
+        settings = json.load(file)
+    env = settings["environment"]["settings"]
+    lat_range = lat_range or (env["latitude_min"], env["latitude_max"])
+    lon_range = lon_range or (env["longitude_min"], env["longitude_max"])
+    end = start + timedelta(days=days)
+    rng = np.random.default_rng(seed)
+
+    data = settings["application"]["data"]
+    data_dir = os.path.join(project_dir, data["storage"])
+    os.makedirs(data_dir, exist_ok=True)
+    datasets = {"current": current_dataset(lat_range, lon_range, start, end, rng),
+                "wind": wind_dataset(lat_range, lon_range, start, end, rng),
+                "depth": depth_dataset(lat_range, lon_range)}
+    now = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+    for name, dataset in datasets.items():
+        dataset.to_netcdf(os.path.join(data_dir, data[name]["file"]))
+        data[name]["updated"] = now
+
+    settings["application"]["settings"]["project_dir"] = os.path.abspath(project_dir)
+    env["latitude_min"], env["latitude_max"] = lat_range
+    env["longitude_min"], env["longitude_max"] = lon_range
+    data["offline"] = True
+    data["time_range_start"] = start.strftime("%Y-%m-%dT%H:%M:%S")
+    data["time_range_end"] = end.strftime("%Y-%m-%dT%H:%M:%S")
+    config_path = os.path.abspath(os.path.join(project_dir, "settings.json"))
+    with open(config_path, "w") as file:
+        json.dump(settings, file, indent=4)
+    return config_path
+
+
+def settings_copy(config_path: str, overrides: Dict[str, Any], directory: Optional[str] = None) -> str:
+    """
+    Writes a copy of a settings file with some values changed.
+
+    :param config_path: Settings file to copy.
+    :param overrides: New values by dotted key, e.g. {"application.logging.level": "WARNING"}.
+    :param directory: Directory to write the copy to. Defaults to the directory of the original.
+    :return: Absolute path of the copy.
+    :raises KeyError: If a key is not in the settings file.
+    """
+    with open(config_path) as file:
+        settings = json.load(file)
+    for key, value in overrides.items():
+        *parents, name = key.split(".")
+        section = settings
+        for parent in parents:
+            section = section.get(parent) if isinstance(section, dict) else None
+        if not isinstance(section, dict) or name not in section:
+            raise KeyError(f"Error: No setting '{key}' in {config_path}.")
+        section[name] = value
+    path = os.path.join(directory or os.path.dirname(config_path), f"settings-{uuid.uuid4().hex[:8]}.json")
+    with open(path, "w") as file:
+        json.dump(settings, file, indent=4)
+    return os.path.abspath(path)
+
+
+def uniform_window(center: Tuple[float, float], start: datetime, end: datetime, current: Tuple[float, float],
+                   land: Optional[Tuple[float, float, float, float]] = None):
+    """
+    A ForcingWindow with one uniform, constant current, no wind and deep water, on a 1/12 degree grid two degrees
+    around a center. Built in memory, without datasets.
+
+    :param center: (lat, lon) center of the grid.
+    :param start: Start of the window.
+    :param end: End of the window. The records extend a day past it.
+    :param current: (u, v) current, in m/s.
+    :param land: Optional (min_lat, max_lat, min_lon, max_lon) box where the current is NaN, as over land.
+    :return: A new ForcingWindow.
+    """
+    # Imported here: the simulation modules create log files when imported.
+    from simulation.ForcingWindow import FieldSlab, ForcingWindow, to_seconds
+
+    times = to_seconds(np.array([start, end + timedelta(days=1)], dtype="datetime64[ns]"))
+    lats = center[0] + np.arange(-24, 25) * CURRENT_STEP
+    lons = center[1] + np.arange(-24, 25) * CURRENT_STEP
+    shape = (times.size, lats.size, lons.size)
+    values = np.broadcast_to(np.array(current, dtype=np.float64), shape + (2,)).copy()
+    if land is not None:
+        inside = (lats[:, None] >= land[0]) & (lats[:, None] <= land[1]) & (lons[None, :] >= land[2]) & (lons[None, :] <= land[3])
+        values[:, inside] = np.nan
+    current_slab = FieldSlab(times, lats, lons, values, ("uo", "vo"))
+    wind = FieldSlab(times, lats, lons, np.zeros(shape + (2,)), ("eastward_wind", "northward_wind"))
+    depth = FieldSlab(np.empty(0), lats, lons, np.full((1, lats.size, lons.size, 1), 1000.0), ("deptho",))
+    return ForcingWindow(current_slab, wind, depth, start, end + timedelta(days=1))
+
+
+@contextlib.contextmanager
+def working_directory(path: str) -> Iterator[str]:
+    """
+    Runs the body of a with statement in another working directory, then goes back. The application's modules create
+    their log files relative to the working directory, so tests and benchmarks run in their temporary project.
+    """
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(cwd)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="Project directory to write the data and settings file to.")
+    parser.add_argument("--days", type=int, default=3, help="Days of current and wind data.")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=datetime(2023, 1, 1), help="First record time, in ISO format.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    args = parser.parse_args()
+    config_path = write_datasets(args.directory, args.days, args.start, args.seed)
+    print(f"Synthetic datasets written. Settings: {config_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
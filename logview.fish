@@ -6,6 +6,7 @@ function logview
 
     if test (count $argv) -lt 1
 	echo "Usage: logview <log_files> [--fields <field1,field2,...>] [--filter <field=value>]"
+	echo "Shared victim logs can be split per victim with --filter victim=<id>"
 	return 1
     end
 
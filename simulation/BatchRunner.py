@@ -0,0 +1,265 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Union
+import multiprocessing
+import os
+import shutil
+import tempfile
+import uuid
+import numpy as np
+import xarray as xr
+
+from application.config import Config
+from application.logger import Logger
+from .CurrentFetcher import CurrentFetcher
+from .DatasetCache import DatasetCache
+from .DepthFetcher import DepthFetcher
+from .WindFetcher import WindFetcher
+from .Environment import Environment
+from .ForcingWindow import ForcingWindow
+from .Simulation import Simulation
+from .VictimEnsemble import VictimEnsemble
+
+logger = Logger(__name__).get()
+
+# How workers get the shared window. See 'environment.settings.batch_sharing'.
+SHARING = ("shared_memory", "mmap", "inherit")
+
+# Per-process state, set once in each worker by _init_worker.
+_worker = {}
+
+
+def _init_worker(config_path: str, sharing: str, source: Union[ForcingWindow, dict, str]) -> None:
+    """
+    :param sharing: One of SHARING.
+    :param source: A shared memory spec, a cache directory, or the window itself, depending on 'sharing'.
+    """
+    _worker["config_path"] = config_path
+    if sharing == "shared_memory":
+        _worker["window"] = ForcingWindow.Attach(source)
+    elif sharing == "mmap":
+        _worker["window"] = ForcingWindow.Load(source, mmap=True)
+    else:
+        _worker["window"] = source
+
+
+def _run_scenario(scenario: dict, directory: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Runs one scenario to its end date on the worker's shared window.
+
+    :param scenario: Scenario dictionary, see 'BatchRunner.Run'.
+    :param directory: Directory to spill the scenario's trajectory to. Must not be shared with any other scenario.
+    :return: Final positions, displacements, path, path times and victim types of the scenario's ensemble.
+    """
+    config_path = _worker["config_path"]
+    sim = Simulation(scenario["lat"], scenario["lon"], config_path, scenario["start_date"], scenario["end_date"], window=_worker["window"])
+    victims = dict(scenario.get("victims", {}))
+    victims.setdefault("lat", scenario["lat"])
+    victims.setdefault("lon", scenario["lon"])
+    ensemble = VictimEnsemble.Generate(victims, sim.env, config_path, rng=np.random.default_rng(scenario.get("seed")), directory=directory)
+    sim._add_ensemble(ensemble)
+    for _ in range(sim.simulation_steps):
+        sim.Tick()
+    # Pool workers exit without running atexit handlers, so queued log records are written here.
+    Logger.flush()
+    return {"start": ensemble.start, "final": ensemble.Positions(), "displacement": ensemble.Displacement(),
+            "active": ensemble.active, "path": ensemble.path, "time": ensemble.path_times, "types": np.array(ensemble.victim_types)}
+
+
+class BatchRunner:
+    """
+    Runs many independent simulation scenarios across a pool of worker processes.
+
+    The wind, current and depth data for every scenario is read once, in the parent, into a single 'ForcingWindow'
+    covering all of their bounds and dates. Workers build their environments from that window, so no worker opens
+    a data file. How the window reaches the workers is set by 'environment.settings.batch_sharing':
+    - "shared_memory": published once into shared memory; workers attach to it without copying.
+    - "mmap": saved as .npy files; workers memory-map them read-only.
+    - "inherit": handed to the pool initializer. Forked workers inherit it, other start methods pickle one copy per worker.
+    With "shared_memory" and "mmap" workers are started with 'spawn', so they hold no copy of the parent's memory and
+    memory per worker stays flat. Scripts using them must guard their entry point with 'if __name__ == "__main__"'.
+    """
+
+    def __init__(self, config_path: str, workers: Optional[int] = None) -> None:
+        """
+        :param config_path: Path to the JSON configuration file. Must be an absolute path.
+        :param workers: Number of worker processes. Defaults to 'environment.settings.batch_workers', where 0 means one per CPU core.
+        """
+        self.config_path = config_path
+        self.config = Config.shared(self.config_path)
+        self.settings = self.config.snapshot()
+        workers = self.settings.get_int("environment.settings.batch_workers") if workers is None else workers
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.sharing = self.settings.get_str("environment.settings.batch_sharing").lower()
+        if self.sharing not in SHARING:
+            raise ValueError(f"Error: Unknown batch sharing mode '{self.sharing}'. Must be one of {SHARING}.")
+        self.cache_directory = self.settings.get_str("environment.settings.batch_cache_directory")
+
+    @staticmethod
+    def Scenarios(count: int, lat: float, lon: float, start_date: datetime, duration: timedelta, victims: Optional[dict] = None,
+                  range_miles: float = 0, start_spread: timedelta = timedelta(0), seed: Optional[int] = None) -> List[dict]:
+        """
+        Generates scenarios with perturbed start positions and dates. Victims within each scenario are perturbed as
+        configured in 'victims', which takes the same keys as 'generate_victims' in wrapper.py.
+
+        :param count: Number of scenarios.
+        :param lat: Nominal starting latitude.
+        :param lon: Nominal starting longitude.
+        :param start_date: Earliest start date.
+        :param duration: Length of every scenario.
+        :param victims: Victim generation settings, shared by all scenarios.
+        :param range_miles: Each scenario's center is moved by up to this many miles in latitude and longitude.
+        :param start_spread: Each scenario starts up to this long after 'start_date'. Rounded down to whole minutes.
+        :param seed: Seed for reproducible scenarios. Each scenario also gets its own seed for victim generation.
+        :return: List of scenario dictionaries, for 'Run'.
+        """
+        rng = np.random.default_rng(seed)
+        degrees = np.degrees(range_miles / 3963.0)
+        minutes = int(start_spread.total_seconds() // 60)
+        scenarios = []
+        for _ in range(count):
+            start = start_date + timedelta(minutes=int(rng.integers(0, minutes + 1)))
+            scenarios.append({"lat": lat + rng.uniform(-degrees, degrees), "lon": lon + rng.uniform(-degrees, degrees),
+                              "start_date": start, "end_date": start + duration, "victims": dict(victims or {}),
+                              "seed": int(rng.integers(2**32))})
+        return scenarios
+
+    def Preload(self, scenarios: List[dict]) -> ForcingWindow:
+        """
+        Reads the data for every scenario into one window: the union of their bounds, and their earliest start to
+        latest end, padded by 'environment.settings.preload_padding_hours'.
+
+        :param scenarios: Scenario dictionaries.
+        :return: A ForcingWindow shared by all scenarios.
+        """
+        margin = self.settings.get_int("environment.settings.default_window_margin")
+        degrees_per_mile = self.settings.get_float("environment.settings.degrees_per_mile")
+        boxes = np.array([Environment.Bounds(s["lat"], s["lon"], margin, degrees_per_mile) for s in scenarios])
+        bounds = (boxes[:, 0].min(), boxes[:, 1].max(), boxes[:, 2].min(), boxes[:, 3].max())
+        padding = timedelta(hours=self.settings.get_float("environment.settings.preload_padding_hours"))
+        start = min(s["start_date"] for s in scenarios) - padding
+        end = max(s["end_date"] for s in scenarios) + padding
+
+        DatasetCache(self.config_path).Prefetch()
+        fetchers = (CurrentFetcher(self.config_path), WindFetcher(self.config_path), DepthFetcher(self.config_path))
+        try:
+            window = ForcingWindow.FromFetchers(*fetchers, start, end, bounds)
+        finally:
+            for fetcher in fetchers:
+                fetcher.CloseDataset()
+        logger.debug({"message": "Batch data preloaded.", "event": "batch_preload", "data": {"scenarios": len(scenarios), "bounds": bounds, "start": start.isoformat(), "end": end.isoformat(), "bytes": window.nbytes}})
+        return window
+
+    def Run(self, scenarios: Iterable[dict], output: Optional[str] = None) -> xr.Dataset:
+        """
+        Runs every scenario and collects the results.
+
+        A scenario is a dictionary with the keys:
+        - lat, lon: Center of the scenario's environment, and the default victim position.
+        - start_date, end_date: Run window.
+        - victims: Victim generation settings, as for 'VictimEnsemble.Generate'. Optional.
+        - seed: Seed for victim generation. Optional.
+
+        If 'environment.settings.trajectory_directory' is set, each scenario's trajectory is spilled to its own
+        directory, scenario_<index>, in a directory named by the batch's start time and a random suffix.
+
+        :param scenarios: Scenario dictionaries, for example from 'Scenarios'.
+        :param output: If set, the results are also written to this NetCDF file.
+        :return: Dataset of start and final positions, displacements and paths, on (scenario, victim) and (scenario, step, victim) axes.
+                 'path_time' holds the time of each path step, in seconds since the scenario start; steps are only evenly
+                 spaced with fixed-step integrators. Scenarios with fewer victims or steps than the largest are padded with NaN.
+        """
+        scenarios = list(scenarios)
+        if not scenarios:
+            raise ValueError("Error: No scenarios to run.")
+        window = self.Preload(scenarios)
+        workers = min(self.workers, len(scenarios))
+        directories = self._trajectory_directories(len(scenarios))
+        logger.info({"message": f"Running {len(scenarios)} scenarios on {workers} workers.", "event": "batch_start", "data": {"scenarios": len(scenarios), "workers": workers, "sharing": self.sharing}})
+
+        if workers == 1:
+            _init_worker(self.config_path, "inherit", window)
+            results = [_run_scenario(s, d) for s, d in zip(scenarios, directories)]
+        else:
+            results = self._run_pool(window, scenarios, directories, workers)
+
+        data = self._collect(scenarios, results)
+        if output:
+            data.to_netcdf(output)
+        logger.info({"message": "\033[32mBatch finished.\033[0m", "event": "batch_finish", "data": {"scenarios": len(scenarios), "output": output}})
+        return data
+
+    def _trajectory_directories(self, count: int) -> List[Optional[str]]:
+        # One spill directory per scenario. Ensembles are all numbered from 1, so without these every scenario would
+        # name its directory the same way.
+        base = self.settings.get_str("environment.settings.trajectory_directory")
+        if not base:
+            return [None] * count
+        batch = os.path.join(base, f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}")
+        return [os.path.join(batch, f"scenario_{i:05d}") for i in range(count)]
+
+    def _run_pool(self, window: ForcingWindow, scenarios: List[dict], directories: List[Optional[str]], workers: int) -> List[Dict[str, np.ndarray]]:
+        shared = None
+        directory = None
+        try:
+            if self.sharing == "shared_memory":
+                shared = window.Publish()
+                source = shared.spec
+            elif self.sharing == "mmap":
+                directory = self.cache_directory or tempfile.mkdtemp(prefix="forcing_window_")
+                source = window.Save(directory)
+            else:
+                source = window
+            context = multiprocessing.get_context(None if self.sharing == "inherit" else "spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(self.config_path, self.sharing, source)) as pool:
+                return list(pool.map(_run_scenario, scenarios, directories))
+        finally:
+            if shared is not None:
+                shared.Close()
+            if directory and not self.cache_directory:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def _collect(self, scenarios: List[dict], results: List[Dict[str, np.ndarray]]) -> xr.Dataset:
+        count = len(results)
+        victims = max(r["final"].shape[0] for r in results)
+        steps = max(r["path"].shape[0] for r in results)
+
+        start = np.full((count, victims, 2), np.nan)
+        final = np.full((count, victims, 2), np.nan)
+        displacement = np.full((count, victims), np.nan)
+        active = np.zeros((count, victims), dtype=np.int8)
+        path = np.full((count, steps, victims, 2), np.nan)
+        path_time = np.full((count, steps), np.nan)
+        types = np.full((count, victims), "", dtype=object)
+        for i, r in enumerate(results):
+            n = r["final"].shape[0]
+            start[i, :n] = r["start"]
+            final[i, :n] = r["final"]
+            displacement[i, :n] = r["displacement"]
+            active[i, :n] = r["active"]
+            path[i, :r["path"].shape[0], :n] = r["path"]
+            path_time[i, :r["time"].shape[0]] = r["time"]
+            types[i, :n] = r["types"]
+
+        return xr.Dataset(
+            {
+                "start_lat": (("scenario", "victim"), start[..., 0]),
+                "start_lon": (("scenario", "victim"), start[..., 1]),
+                "final_lat": (("scenario", "victim"), final[..., 0]),
+                "final_lon": (("scenario", "victim"), final[..., 1]),
+                "displacement": (("scenario", "victim"), displacement, {"units": "m"}),
+                "active": (("scenario", "victim"), active),
+                "victim_type": (("scenario", "victim"), types.astype(str)),
+                "path_lat": (("scenario", "step", "victim"), path[..., 0]),
+                "path_lon": (("scenario", "step", "victim"), path[..., 1]),
+                "path_time": (("scenario", "step"), path_time, {"units": "s", "description": "Time since the scenario start"}),
+            },
+            coords={
+                "scenario": np.arange(count),
+                "victim": np.arange(1, victims + 1),
+                "center_lat": ("scenario", np.array([s["lat"] for s in scenarios], dtype=np.float64)),
+                "center_lon": ("scenario", np.array([s["lon"] for s in scenarios], dtype=np.float64)),
+                "start_date": ("scenario", np.array([s["start_date"] for s in scenarios], dtype="datetime64[ns]")),
+                "end_date": ("scenario", np.array([s["end_date"] for s in scenarios], dtype="datetime64[ns]")),
+            },
+        )
@@ -8,7 +8,7 @@ import math
 class BathymetryFetcher:
     def __init__(self, filepath, config_path):
         self.file = filepath
-        self.config = Config(config_path)
+        self.config = Config.shared(config_path)
 
         if os.path.exists(self.file):
             with rasterio.open(self.file) as dataset:
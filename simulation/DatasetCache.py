@@ -0,0 +1,314 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional, Sequence
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+import xarray as xr
+
+from application.config import Config
+from application.logger import Logger
+
+logger = Logger(__name__).get()
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+class DatasetCache:
+    """
+    Local cache of the current, wind and depth datasets, described by a manifest.
+
+    The manifest ('manifest.json' in 'application.data.storage') records, for every cached file: its size,
+    modification time and SHA-256 checksum, its bounding box, time range and grid resolution, its variables, and
+    when it was downloaded. Whether a file covers what the configuration asks for is decided from the manifest
+    alone, without the network or the Copernicus client. Files without a manifest entry, such as a stand-in
+    directory of NetCDF files copied onto an air-gapped node, are described from their own coordinates on first use.
+
+    With 'application.data.offline' set, cached files never expire, and a file that does not cover the request is
+    an error instead of a download.
+    """
+    MANIFEST = "manifest.json"
+
+    # For each dataset: the variables downloaded, and those the simulation needs to find in the file.
+    DATASETS = {
+        "current": {"variables": ["uo", "vo"], "required": ["uo", "vo"], "timed": True},
+        "wind": {"variables": ["eastward_wind", "northward_wind", "eastward_stress", "northward_stress", "wind_divergence", "wind_curl"], "required": ["eastward_wind", "northward_wind"], "timed": True},
+        "depth": {"variables": ["deptho", "mask"], "required": ["deptho"], "timed": False},
+    }
+
+    # The manifest is shared by every fetcher in the process.
+    _lock = threading.Lock()
+
+    def __init__(self, config_path: str) -> None:
+        """
+        :param config_path: Path to the configuration file.
+        """
+        self.config_path = config_path
+        self.c = Config.shared(config_path)
+        self.data_dir = os.path.join(self.c.get_value("application.settings.project_dir"), self.c.get_value("application.data.storage"))
+        self.manifest_path = os.path.join(self.data_dir, self.MANIFEST)
+
+    def Path(self, name: str) -> str:
+        """
+        :param name: Dataset name: "current", "wind" or "depth".
+        :return: Path of the dataset's cached file.
+        """
+        return os.path.join(self.data_dir, self.c.get_value(f"application.data.{name}.file"))
+
+    def Offline(self) -> bool:
+        return self.c.get_bool("application.data.offline")
+
+    def Request(self, name: str) -> dict:
+        """
+        What the configuration asks the dataset to cover.
+
+        :return: Dictionary of dataset_id, variables, required variables, bbox (min_lat, max_lat, min_lon, max_lon),
+                 and time_range (start, end) or None for static datasets.
+        """
+        spec = self.DATASETS[name]
+        bbox = [self.c.get_float(f"environment.settings.{key}") for key in ("latitude_min", "latitude_max", "longitude_min", "longitude_max")]
+        time_range = [datetime.strptime(self.c.get_value(f"application.data.time_range_{key}"), DATE_FORMAT) for key in ("start", "end")]
+        return {"dataset_id": self.c.get_value(f"application.data.{name}.ID"), "variables": spec["variables"], "required": spec["required"],
+                "bbox": bbox, "time_range": time_range if spec["timed"] else None}
+
+    def _read_manifest(self) -> Dict[str, dict]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path) as file:
+            return json.load(file)
+
+    def _write_entry(self, name: str, entry: dict) -> None:
+        with DatasetCache._lock:
+            manifest = self._read_manifest()
+            manifest[name] = entry
+            temp = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(temp, "w") as file:
+                json.dump(manifest, file, indent=4)
+            os.replace(temp, self.manifest_path)
+
+    @staticmethod
+    def Checksum(path: str) -> str:
+        """
+        :return: Hex SHA-256 of a file, read in 1 MiB blocks.
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def Describe(path: str) -> dict:
+        """
+        Reads the extent of a NetCDF file from its coordinates. Data variables are not read.
+
+        :return: Dictionary of bbox, time_range (ISO strings, or None), resolution (degrees, and seconds for time) and variables.
+        """
+        with xr.open_dataset(path) as data:
+            lats, lons = data["latitude"].values, data["longitude"].values
+            resolution = {"latitude": float(np.abs(np.diff(lats)).max()) if lats.size > 1 else 0.0,
+                          "longitude": float(np.abs(np.diff(lons)).max()) if lons.size > 1 else 0.0}
+            time_range = None
+            if "time" in data.coords and data["time"].size:
+                times = data["time"].values.astype("datetime64[s]")
+                time_range = [str(times.min()), str(times.max())]
+                resolution["time"] = float(np.diff(times).astype(np.int64).max()) if times.size > 1 else 0.0
+            return {"bbox": [float(lats.min()), float(lats.max()), float(lons.min()), float(lons.max())], "time_range": time_range,
+                    "resolution": resolution, "variables": sorted(data.data_vars)}
+
+    def Record(self, name: str, updated: Optional[datetime] = None) -> dict:
+        """
+        Describes a dataset's file and writes it to the manifest.
+
+        :param name: Dataset name.
+        :param updated: When the file was downloaded. Defaults to now.
+        :return: The manifest entry.
+        """
+        path = self.Path(name)
+        stat = os.stat(path)
+        entry = dict(self.Describe(path), file=os.path.basename(path), dataset_id=self.Request(name)["dataset_id"], size=stat.st_size,
+                     mtime_ns=stat.st_mtime_ns, sha256=self.Checksum(path), updated=(updated or datetime.now()).strftime(DATE_FORMAT))
+        self._write_entry(name, entry)
+        logger.debug({"message": f"Recorded '{name}' dataset in the cache manifest.", "event": "dataset_cache_record", "data": {"dataset": name, "entry": entry}})
+        return entry
+
+    def Entry(self, name: str) -> Optional[dict]:
+        """
+        The manifest entry for a dataset's file, refreshed if the file changed since it was recorded.
+        A file without an entry is recorded, dated by 'application.data.<name>.updated'.
+
+        :return: The entry, or None if the file does not exist.
+        """
+        path = self.Path(name)
+        if not os.path.exists(path):
+            return None
+        entry = self._read_manifest().get(name)
+        stat = os.stat(path)
+        if entry and entry.get("file") == os.path.basename(path) and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return entry
+        # A file changed since it was recorded is dated by its modification time.
+        updated = None if entry else self.c.get_value(f"application.data.{name}.updated")
+        return self.Record(name, datetime.strptime(updated, DATE_FORMAT) if updated else datetime.fromtimestamp(stat.st_mtime))
+
+    def Covers(self, name: str, entry: dict) -> bool:
+        """
+        Checks that a manifest entry is of the configured dataset ID, and covers the configured bounding box, time
+        range and variables, give or take one grid step.
+        """
+        request = self.Request(name)
+        if entry.get("dataset_id") != request["dataset_id"]:
+            return False
+        if any(v not in entry["variables"] for v in request["required"]):
+            return False
+        step_lat, step_lon = entry["resolution"]["latitude"], entry["resolution"]["longitude"]
+        min_lat, max_lat, min_lon, max_lon = entry["bbox"]
+        want = request["bbox"]
+        if min_lat > want[0] + step_lat or max_lat < want[1] - step_lat or min_lon > want[2] + step_lon or max_lon < want[3] - step_lon:
+            return False
+        if request["time_range"] is not None:
+            if entry["time_range"] is None:
+                return False
+            step = np.timedelta64(int(entry["resolution"].get("time", 0)), "s")
+            first, last = (np.datetime64(t) for t in entry["time_range"])
+            start, end = (np.datetime64(t) for t in request["time_range"])
+            if first > start + step or last < end - step:
+                return False
+        return True
+
+    def Valid(self, name: str) -> bool:
+        """
+        Checks whether the cached file for a dataset exists, covers the request, and has not expired.
+        Never imports the Copernicus client or touches the network.
+        """
+        entry = self.Entry(name)
+        if entry is None:
+            return False
+        if not self.Covers(name, entry):
+            logger.warning({"message": f"Cached '{name}' dataset does not match the configured dataset ID, or does not cover the configured region, time range or variables.", "event": "dataset_cache_coverage", "data": {"dataset": name, "entry": entry, "request": str(self.Request(name))}})
+            return False
+        if self.Offline():
+            return True
+        age = datetime.now() - datetime.strptime(entry["updated"], DATE_FORMAT)
+        return age.days <= self.c.get_int("application.data.expiration")
+
+    def _client(self, subset: Optional[Callable]) -> Callable:
+        if self.Offline():
+            raise RuntimeError(f"Error: Datasets in {self.data_dir} are missing or do not cover the request, and 'application.data.offline' is set.")
+        if subset is None:
+            # Imported here: the client is slow to import, and only needed to download.
+            import copernicusmarine
+            subset = copernicusmarine.subset
+        return subset
+
+    def _subset_arguments(self, name: str) -> dict:
+        request = self.Request(name)
+        time_range = request["time_range"] or [datetime.strptime(self.c.get_value(f"application.data.time_range_{key}"), DATE_FORMAT) for key in ("start", "end")]
+        return dict(
+            username = self.c.get_value("application.settings.copernicus_username"),
+            password = self.c.get_value("application.settings.copernicus_password"),
+            dataset_id = request["dataset_id"],
+            variables = request["variables"],
+            start_datetime = time_range[0].isoformat(),
+            end_datetime = time_range[1].isoformat(),
+            minimum_latitude = request["bbox"][0],
+            maximum_latitude = request["bbox"][1],
+            minimum_longitude = request["bbox"][2],
+            maximum_longitude = request["bbox"][3],
+            )
+
+    def _download(self, name: str, subset: Callable, arguments: dict, retries: int, backoff: float) -> dict:
+        """
+        Downloads one dataset into a temporary directory next to the cache, retrying with exponential backoff, then
+        moves it into place and records it. The cached file is only replaced by a complete download.
+        Safe to run on several threads at once: it does not touch the configuration.
+
+        :return: The manifest entry.
+        """
+        path = self.Path(name)
+        filename = os.path.basename(path)
+        os.makedirs(self.data_dir, exist_ok=True)
+        directory = tempfile.mkdtemp(prefix=f".{name}-", dir=self.data_dir)
+        try:
+            for attempt in range(retries + 1):
+                try:
+                    subset(**arguments, output_filename=filename, output_directory=directory)
+                    break
+                except Exception as e:
+                    if attempt == retries:
+                        raise
+                    delay = backoff * 2**attempt
+                    logger.warning({"message": f"Download of the '{name}' dataset failed, retrying in {delay:g} s.", "event": "dataset_cache_retry", "data": {"dataset": name, "attempt": attempt + 1, "error": repr(e)}})
+                    time.sleep(delay)
+            os.replace(os.path.join(directory, filename), path)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        return self.Record(name, datetime.now())
+
+    def Fetch(self, name: str, subset: Optional[Callable] = None) -> dict:
+        """
+        Downloads a dataset from Copernicus Marine into the cache, and records it in the manifest.
+
+        :param name: Dataset name.
+        :param subset: Function called with the keyword arguments of 'copernicusmarine.subset'. Defaults to the real client.
+        :return: The manifest entry.
+        :raises RuntimeError: In offline mode.
+        """
+        return self.Prefetch([name], subset=subset, force=True)[name]
+
+    def Prefetch(self, names: Optional[Sequence[str]] = None, subset: Optional[Callable] = None, force: bool = False) -> Dict[str, dict]:
+        """
+        Downloads every dataset that is not valid, all at once on a thread pool, so a refresh takes as long as the
+        slowest dataset rather than the sum of them. Each download is retried 'application.data.download_retries'
+        times, waiting 'application.data.download_backoff_seconds', doubled after every attempt.
+
+        :param names: Datasets to check. Defaults to all of them.
+        :param subset: Function called with the keyword arguments of 'copernicusmarine.subset'. Defaults to the real client.
+        :param force: Download even valid datasets.
+        :return: Manifest entries of the datasets downloaded.
+        :raises RuntimeError: If a download fails after every retry, or in offline mode. Successful downloads are kept.
+        """
+        names = list(self.DATASETS if names is None else names)
+        if not force:
+            names = [name for name in names if not self.Valid(name)]
+        if not names:
+            return {}
+        subset = self._client(subset)
+        retries = self.c.get_int("application.data.download_retries")
+        backoff = self.c.get_float("application.data.download_backoff_seconds")
+        logger.info({"message": f"Downloading datasets: {', '.join(names)}.", "event": "dataset_cache_prefetch", "data": {"datasets": names}})
+
+        entries, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=len(names)) as pool:
+            futures = {name: pool.submit(self._download, name, subset, self._subset_arguments(name), retries, backoff) for name in names}
+            for name, future in futures.items():
+                try:
+                    entries[name] = future.result()
+                except Exception as e:
+                    errors[name] = e
+
+        # The configuration is only written from this thread.
+        for name, entry in entries.items():
+            self.c.set_value(f"application.data.{name}.updated", entry["updated"])
+        if errors:
+            logger.critical({"message": f"Could not download datasets: {', '.join(errors)}.", "event": "dataset_cache_prefetch_error", "data": {"errors": {n: repr(e) for n, e in errors.items()}}})
+            raise RuntimeError(f"Error: Could not download datasets: {', '.join(f'{n} ({e})' for n, e in errors.items())}")
+        return entries
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Downloads the current, wind and depth datasets that are missing, expired, or do not cover the configuration.")
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources", "settings.json"), help="Path to the configuration file.")
+    parser.add_argument("--force", action="store_true", help="Download every dataset, even valid ones.")
+    parser.add_argument("datasets", nargs="*", help=f"Datasets to check, from {', '.join(DatasetCache.DATASETS)}. Defaults to all of them.")
+    args = parser.parse_args()
+    unknown = [name for name in args.datasets if name not in DatasetCache.DATASETS]
+    if unknown:
+        parser.error(f"unknown datasets: {', '.join(unknown)}")
+    entries = DatasetCache(os.path.abspath(args.config)).Prefetch(args.datasets or None, force=args.force)
+    print(f"Downloaded: {', '.join(entries) or 'nothing, every dataset is valid'}.")
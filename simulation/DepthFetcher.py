@@ -1,8 +1,7 @@
 from application.config import Config
+from .DatasetCache import DatasetCache
 
-import copernicusmarine
 import os
-from datetime import datetime
 import xarray as xr
 
 class DepthFetcher:
@@ -13,7 +12,8 @@ class DepthFetcher:
 
         :param config_path: Path to the configuration file.
         """
-        self.c = Config(config_path)
+        self.c = Config.shared(config_path)
+        self.cache = DatasetCache(config_path)
 
         data_subdir = self.c.get_value("application.data.storage")
         root_path = self.c.get_value("application.settings.project_dir")
@@ -30,50 +30,18 @@ class DepthFetcher:
         
     def ValidDataset_p(self) -> bool:
         """
-        Checks whether the stored dataset is valid based on expiration and existence.
+        Checks whether the stored dataset exists, covers the configured region, time range and variables, and has not expired.
+        Decided from the cache manifest, see 'DatasetCache.Valid'.
 
         :return: True if dataset is valid, False otherwise.
         """
-        path = os.path.join(self.data_dir, self.data_file)
-        if not isinstance(datetime.strptime(self.data_updated, '%Y-%m-%dT%H:%M:%S'), datetime):
-            return False
-        if os.path.exists(path):
-            last_updated = datetime.strptime(self.data_updated, '%Y-%m-%dT%H:%M:%S')
-            now = datetime.now()
-            diff = now - last_updated
-            days = diff.days
-            if days > int(self.data_expiration):
-                return False
-            return True
-        else:
-            return False
+        return self.cache.Valid("depth")
 
     def FetchDataset(self) -> None:
         """
-        Fetches the dataset from the Copernicus Marine service and updates metadata.
+        Fetches the dataset from the Copernicus Marine service and records it in the cache manifest.
         """
-        path = os.path.join(self.data_dir, self.data_file)
-        if os.path.exists(path):
-            os.remove(path)
-
-        dataset_start = datetime.strptime(self.c.get_value("application.data.time_range_start"), '%Y-%m-%dT%H:%M:%S').isoformat()
-        dataset_end = datetime.strptime(self.c.get_value("application.data.time_range_end"), '%Y-%m-%dT%H:%M:%S').isoformat()
-        
-        copernicusmarine.subset(
-            username = self.c.get_value("application.settings.copernicus_username"),
-            password = self.c.get_value("application.settings.copernicus_password"),
-            dataset_id = self.c.get_value("application.data.depth.ID"),
-            variables = ["deptho", "mask"],
-            start_datetime = dataset_start,
-            end_datetime = dataset_end,
-            minimum_latitude = float(self.c.get_value("environment.settings.latitude_min")),
-            maximum_latitude = float(self.c.get_value("environment.settings.latitude_max")),
-            minimum_longitude = float(self.c.get_value("environment.settings.longitude_min")),
-            maximum_longitude = float(self.c.get_value("environment.settings.longitude_max")),
-            output_filename = self.data_file,
-            output_directory = self.data_dir
-            )
-        self.c.set_value("application.data.depth.updated", datetime.now().strftime('%Y-%m-%dT%H:%M:%S'))
+        self.cache.Fetch("depth")
 
     def LoadDataset(self):
         """
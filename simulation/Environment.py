@@ -3,17 +3,18 @@ from typing import Dict,Tuple, Optional
 import os
 from datetime import datetime, timedelta
 import random
-import matplotlib.pyplot as plt
+import uuid
 import numpy as np
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-from scipy.interpolate import RegularGridInterpolator
 
 from application.config import Config
 from application.logger import Logger
+from application.profiler import phase
 from .CurrentFetcher import CurrentFetcher
+from .DatasetCache import DatasetCache
 from .DepthFetcher import DepthFetcher
 from .WindFetcher import WindFetcher
+from .ForcingWindow import ForcingWindow, FieldSlab, to_seconds
+from .GridSampler import Sampler, create_sampler
 
 logger = Logger(__name__).get()
 
@@ -23,7 +24,7 @@ class Environment:
     fetching data on currents, depth, and wind within a specified boundary.
     """
 
-    def __init__(self, lat: float, lon: float, config_path: str, margin:int=0, date:Optional[datetime]=None) -> None:
+    def __init__(self, lat: float, lon: float, config_path: str, margin:int=0, date:Optional[datetime]=None, end_date:Optional[datetime]=None, window:Optional[ForcingWindow]=None) -> None:
         """
         Initializes the Environment object with geographic location and configuration settings.
         
@@ -31,21 +32,36 @@ class Environment:
         :param lon: Starting longitude.
         :param config_path: Path to the configuration file. Must be an absolute path.
         :param margin: Margin, in miles, around the starting point.
-        :param config_path:
+        :param date: Starting date. If undefined, a random date is chosen.
+        :param end_date: End of the run window. Wind and current data for the whole window are interpolated in time. Defaults to the starting date.
+        :param window: An already preloaded 'ForcingWindow' covering the bounds and the run window. No datasets are opened, and the
+                       environment cannot be updated to a date outside the window.
         """
         self.config_path = config_path
-        self.config = Config(self.config_path)
+        self.config = Config.shared(self.config_path)
+        self.settings = self.config.snapshot()
         self.center = (lat,lon)
-        self.margin = int(self.config.get_value("environment.settings.default_window_margin")) if margin == 0 else margin
+        self.margin = self.settings.get_int("environment.settings.default_window_margin") if margin == 0 else margin
         self.bounds = self._calculate_bounds()
         self.date = self._get_random_date() if not date else date
+        self.end_date = end_date if end_date and end_date > self.date else self.date
+        # Unique per environment, so runs and simulations sharing a trajectory directory never share a subdirectory.
+        self.run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
         logger.info({"message": "\033[32mEnvironment initialized.\033[0m"})
-        logger.debug({"event": "environment_object_created", "data": {"center": self.center, "margin":self.margin, "bounds":self.bounds, "date":self.date.isoformat()}})
-
+        logger.debug({"event": "environment_object_created", "data": {"center": self.center, "margin":self.margin, "bounds":self.bounds, "date":self.date.isoformat(), "run_id": self.run_id}})
 
+        if window is None:
+            # Any missing or expired datasets are downloaded together, before the fetchers look for them.
+            DatasetCache(self.config_path).Prefetch()
+            # Fetchers are long-lived: their datasets stay open until Close() is called.
+            self.current_fetcher = CurrentFetcher(self.config_path)
+            self.depth_fetcher = DepthFetcher(self.config_path)
+            self.wind_fetcher = WindFetcher(self.config_path)
+            self.Preload(self.date, self.end_date)
+        else:
+            self.current_fetcher = self.depth_fetcher = self.wind_fetcher = None
+            self._use_window(window)
         self.Update()
-        self.wind_interpolator = self._create_interpolator(self.wind_data, "eastward_wind", "northward_wind")
-        self.current_interpolator = self._create_interpolator(self.current_data, "uo", "vo")
         
     def _calculate_bounds(self) -> Tuple[float,float,float,float]:
         """
@@ -63,30 +79,34 @@ class Environment:
             logger.warning({"message":"The value for 'environment.settings.degrees_per_mile' must be an float value.", "event":"conversion_factor_error", "data":{"config_path":self.config_path, "conversion_factor":conversion_factor}})
             raise ValueError(f"Error: Invalid setting for environment.settings.degrees_per_mile\nValue '{conversion_factor}' is not a float.")
 
-        lat = self.center[0]
-        lon = self.center[1]
-
-        lat_margin = self.margin / conversion_factor
-        lon_margin = self.margin / (conversion_factor * math.cos(math.radians(lat)))
-
-        min_lat = lat - lat_margin
-        max_lat = lat + lat_margin
-        min_lon = lon - lon_margin
-        max_lon = lon + lon_margin
+        min_lat, max_lat, min_lon, max_lon = self.Bounds(self.center[0], self.center[1], self.margin, conversion_factor)
         logger.debug({"message": "Environment bounds calculated successfully.", "event":"calculate_bounds", "data":{"min_lat":min_lat,"max_lat":max_lat,"min_lon":min_lon,"max_lon":max_lon}})
 
         return (min_lat, max_lat, min_lon, max_lon)
 
+    @staticmethod
+    def Bounds(lat: float, lon: float, margin: float, degrees_per_mile: float) -> Tuple[float,float,float,float]:
+        """
+        Bounding box of 'margin' miles around a point.
+
+        :param lat: Center latitude.
+        :param lon: Center longitude.
+        :param margin: Margin, in miles.
+        :param degrees_per_mile: Value of 'environment.settings.degrees_per_mile'.
+        :return: Tuple[min_lat, max_lat, min_lon, max_lon]
+        """
+        lat_margin = margin / degrees_per_mile
+        lon_margin = margin / (degrees_per_mile * math.cos(math.radians(lat)))
+        return (lat - lat_margin, lat + lat_margin, lon - lon_margin, lon + lon_margin)
+
     def _get_random_date(self) -> datetime:
         """
         Retrieves a random date within the configured time range.
 
         :return: A datetime object representing a randomly chosen timestamp.
         """
-        start = self.config.get_value("application.data.time_range_start")
-        start = datetime.fromisoformat(start)
-        end = self.config.get_value("application.data.time_range_end")
-        end = datetime.fromisoformat(end)
+        start = self.settings.get_datetime("application.data.time_range_start")
+        end = self.settings.get_datetime("application.data.time_range_end")
 
         delta = end-start
         random_seconds = random.randint(0,int(delta.total_seconds()))
@@ -94,57 +114,138 @@ class Environment:
         logger.info({"message":"Random date generated successfully.","event":"random_date","data":{"date":result.isoformat()}})
         return result
 
-    def _create_interpolator(self, data: dict, u_key: str, v_key: str):
-        latitudes = np.array(data["latitude"])
-        longitudes = np.array(data["longitude"])
-        u_val = np.array(data[u_key])
-        v_val = np.array(data[v_key])
+    def _create_interpolator(self, slab: FieldSlab) -> Sampler:
+        """
+        Builds a single space-time sampler over every component of a slab, so one pass returns all of them.
+
+        The Copernicus grids are evenly spaced, so this is normally a 'UniformGridSampler', which finds grid cells
+        arithmetically. Other grids fall back to scipy's RegularGridInterpolator.
+
+        :param slab: Preloaded field.
+        :return: Sampler mapping (time, lat, lon) points to (..., components) arrays. Time is in epoch seconds.
+        """
+        return create_sampler(slab.times, slab.lats, slab.lons, slab.values)
+
+    def Preload(self, start: datetime, end: datetime) -> None:
+        """
+        Reads the wind, current and depth data for [start, end] and the environment bounds into memory,
+        and builds the interpolators over it. Every later query and update reads from the preloaded arrays.
+
+        The window is padded on both sides by 'environment.settings.preload_padding_hours'.
 
-        u_interp = RegularGridInterpolator((latitudes, longitudes), u_val, bounds_error=False, fill_value=None)
-        v_interp = RegularGridInterpolator((latitudes, longitudes), v_val, bounds_error=False, fill_value=None)
+        :param start: Start of the run window.
+        :param end: End of the run window.
+        """
+        padding = timedelta(hours=self.settings.get_float("environment.settings.preload_padding_hours"))
+        self._use_window(ForcingWindow.FromFetchers(self._fetcher(self.current_fetcher), self._fetcher(self.wind_fetcher), self._fetcher(self.depth_fetcher), start - padding, end + padding, self.bounds))
 
-        return lambda lat, lon: (u_interp((lat, lon)), v_interp((lat, lon)))
+    def _use_window(self, window: ForcingWindow) -> None:
+        self.window = window
+        self.forcing_interpolator = self._create_interpolator(self.window.forcing)
+        # Depth is static, so it is read once per window. The timed snapshots are refreshed by Update.
+        self.depth_data = self.DepthData()
+        self._snapshot_intervals = {}
+        resolution = {name: getattr(self.window, name).resolution for name in ("current", "wind", "depth")}
+        logger.debug({"message": "Environment data preloaded.", "event": "environment_preload", "data": {"start": self.window.start.isoformat(), "end": self.window.end.isoformat(), "bytes": self.window.nbytes, "resolution_seconds": resolution}})
+
+    def _sample(self, interpolator: Sampler, t: float, lats, lons) -> np.ndarray:
+        """
+        Samples an interpolator at time t. Times outside the slab are held at the nearest edge rather than extrapolated.
+        Timed as the "interpolation" phase of the active tick profiler.
+        """
+        with phase("interpolation"):
+            return interpolator.Sample(t, lats, lons)
+
+    def InBounds(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """
+        Checks which points lie inside the environment bounds.
+
+        :param lats: Array of latitudes.
+        :param lons: Array of longitudes.
+        :return: Boolean array, True where the point is inside the bounds.
+        """
+        lat_min, lat_max, lon_min, lon_max = self.bounds
+        return (lats >= lat_min) & (lats <= lat_max) & (lons >= lon_min) & (lons <= lon_max)
+
+    def _fetcher(self, fetcher):
+        if fetcher is None:
+            raise ValueError("Error: Environment has no open datasets. It has been closed, or was built from a fixed window.")
+        return fetcher
 
     def CurrentData(self):
         """
-        Fetches surface current data within the environment bounds.
+        Surface current data within the environment bounds, at the record nearest the current date.
 
         :return: Surface current data.
         """
-        fetcher = CurrentFetcher(self.config_path)
-        logger.debug({"message":"Current data fetched successfully.", "event": "current_fetch"})
-        return fetcher.SurfaceCurrents(self.date, self.bounds[0], self.bounds[1], self.bounds[2], self.bounds[3])
+        slab = self.window.current
+        return slab.Snapshot(slab.Index(to_seconds(self.date).item()))
 
     def DepthData(self):
         """
-        Fetches depth data within the environment bounds.
+        Depth data within the environment bounds.
 
         :return: Depth data.
         """
-        fetcher = DepthFetcher(self.config_path)
-        logger.debug({"message": "Depth date fetched successfully.", "event": "depth_fetch"})
-        return fetcher.DepthData(self.bounds[0], self.bounds[1], self.bounds[2], self.bounds[3])
+        return self.window.depth.Snapshot(0)
 
     def WindData(self):
         """
-        Fetches wind data within the environment bounds.
+        Wind data within the environment bounds, at the record nearest the current date.
 
         :return: Wind data.
         """
-        fetcher = WindFetcher(self.config_path)
-        logger.debug({"message": "Wind data fetched successfully.", "event": "wind_fetch"})
-        return fetcher.WindData(self.date, self.bounds[0], self.bounds[1], self.bounds[2], self.bounds[3])
+        slab = self.window.wind
+        return slab.Snapshot(slab.Index(to_seconds(self.date).item()))
+
+    def Close(self) -> None:
+        """
+        Closes the datasets held by the environment's fetchers. Safe to call more than once.
+        """
+        for fetcher in (self.current_fetcher, self.depth_fetcher, self.wind_fetcher):
+            if fetcher is not None:
+                fetcher.CloseDataset()
+        self.current_fetcher = self.depth_fetcher = self.wind_fetcher = None
+        logger.debug({"message": "Environment datasets closed.", "event": "environment_close"})
+
+    def __enter__(self) -> "Environment":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.Close()
 
     def Update(self, date:Optional[datetime]=None):
 
         # Does this cause issues? Nothing should be calling this function except the simulation.Tick method, but this does potentially allow arbitrary dates.
         if date:
             self.date = date
-        
-        self.current_data = self.CurrentData()
-        self.depth_data = self.DepthData()
-        self.wind_data = self.WindData()
-        logger.debug({"message": f"Environment data updated for {self.date.strftime('%d%b%Y %H:%M:%S')}", "event": "environment_update", "data": {"date": self.date.isoformat()}})
+        if not self.window.Covers(self.date):
+            self.Preload(self.date, max(self.date, self.end_date))
+
+        # Each snapshot only changes when the date crosses into another record of its field: daily for currents,
+        # hourly for wind. Most ticks refresh nothing.
+        t = to_seconds(self.date).item()
+        refreshed = [name for name in ("current", "wind") if self._refresh(name, t)]
+        if refreshed:
+            logger.debug({"message": f"Environment data updated for {self.date.strftime('%d%b%Y %H:%M:%S')}", "event": "environment_update", "data": {"date": self.date.isoformat(), "refreshed": refreshed}})
+
+    def _refresh(self, name: str, t: float) -> bool:
+        """
+        Replaces a field's snapshot ('current_data' or 'wind_data') if time t is nearest another record than the
+        snapshot's.
+
+        :param name: "current" or "wind".
+        :param t: Time, in epoch seconds.
+        :return: True if the snapshot was replaced.
+        """
+        start, end = self._snapshot_intervals.get(name, (np.inf, -np.inf))
+        if start < t <= end:
+            return False
+        slab = getattr(self.window, name)
+        index = slab.Index(t)
+        setattr(self, f"{name}_data", slab.Snapshot(index))
+        self._snapshot_intervals[name] = slab.Interval(index)
+        return True
 
     def Query(self, lat: float, lon: float) -> Dict[str, Tuple[float, float]]:
         """
@@ -160,11 +261,31 @@ class Environment:
             logger.warning({"message": f"Query point ({lat}, {lon}) is out of bounds!", "event": "environment_query_bounds_error", "data": {"lat_bounds": (lat_min, lat_max), "lon_bounds": (lon_min, lon_max), "lat": lat, "lon": lon}})
             raise ValueError(f"Coordinate ({lat}, {lon}) is out of bounds. Something went wrong.")
         
-        u_wind, v_wind = self.wind_interpolator(lat, lon)
-        u_cur, v_cur = self.current_interpolator(lat, lon)
-        return {"net_wind": (u_wind.item(), v_wind.item()), "net_current": (u_cur.item(), v_cur.item())}
+        t = to_seconds(self.date).item()
+        u_cur, v_cur, u_wind, v_wind = self._sample(self.forcing_interpolator, t, lat, lon).tolist()
+        return {"net_wind": (u_wind, v_wind), "net_current": (u_cur, v_cur)}
         #return {"net_current": (u_cur.item(), v_cur.item())}
 
+    def QueryMany(self, lats: np.ndarray, lons: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Query wind and current data at many points at once.
+
+        Out-of-bounds points do not raise; they are flagged in the returned mask and their vectors are NaN.
+
+        :param lats: Array of N latitudes.
+        :param lons: Array of N longitudes.
+        :return: Dictionary with "net_wind" and "net_current" as (N, 2) arrays of (u, v), and "in_bounds" as an (N,) boolean mask.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        in_bounds = self.InBounds(lats, lons)
+        t = to_seconds(self.date).item()
+
+        forcing = self._sample(self.forcing_interpolator, t, lats, lons)
+        if not in_bounds.all():
+            forcing[~in_bounds] = np.nan
+        return {"net_wind": forcing[..., 2:4], "net_current": forcing[..., 0:2], "in_bounds": in_bounds}
+
 if __name__ == "__main__":
     lat = 30.0
     lon = -80.0
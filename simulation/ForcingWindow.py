@@ -0,0 +1,329 @@
+from datetime import datetime
+from multiprocessing import shared_memory
+from typing import List, Optional, Sequence, Tuple
+import json
+import os
+import numpy as np
+import xarray as xr
+
+from .GridSampler import create_sampler
+
+
+def to_seconds(times) -> np.ndarray:
+    """
+    Converts datetimes to seconds since the Unix epoch. This is the time axis used by preloaded fields and interpolators.
+
+    :param times: A datetime, a numpy datetime64, or an array of either.
+    :return: Array of float64 seconds.
+    """
+    return (np.asarray(times, dtype="datetime64[ns]") - np.datetime64(0, "ns")) / np.timedelta64(1, "s")
+
+
+class FieldSlab:
+    """
+    One preloaded gridded field, held in memory as a compact float32 array on (time, lat, lon, component) axes.
+    Static fields have a single record and an empty time axis.
+    """
+
+    def __init__(self, times: np.ndarray, lats: np.ndarray, lons: np.ndarray, values: np.ndarray, names: Sequence[str]) -> None:
+        """
+        :param times: Record times, in epoch seconds. Empty for static fields.
+        :param lats: Latitude axis.
+        :param lons: Longitude axis.
+        :param values: Array of shape (records, lat, lon, components).
+        :param names: Variable name of each component, in order.
+        """
+        self.times = np.asarray(times, dtype=np.float64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.values = np.ascontiguousarray(values, dtype=np.float32)
+        self.names = tuple(names)
+
+    @classmethod
+    def FromDataset(cls, data: xr.Dataset, names: Sequence[str]) -> "FieldSlab":
+        """
+        Reads the named variables of a dataset into memory. This is the only point at which the file is read.
+
+        :param data: Dataset with latitude and longitude dimensions, and optionally a time dimension.
+        :param names: Variables to read, one per component.
+        :return: A new FieldSlab.
+        """
+        if "time" in data.dims:
+            times = to_seconds(data["time"].values)
+            values = np.stack([data[n].transpose("time", "latitude", "longitude").values for n in names], axis=-1)
+        else:
+            times = np.empty(0)
+            values = np.stack([data[n].transpose("latitude", "longitude").values for n in names], axis=-1)[None]
+        return cls(times, data["latitude"].values, data["longitude"].values, values, names)
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+    def Index(self, t: float) -> int:
+        """
+        Index of the record nearest to time t. Always 0 for static fields.
+
+        :param t: Time, in epoch seconds.
+        """
+        if self.times.shape[0] <= 1:
+            return 0
+        i = int(np.searchsorted(self.times, t))
+        if i == 0:
+            return 0
+        if i == self.times.shape[0]:
+            return i - 1
+        return i if self.times[i] - t < t - self.times[i-1] else i - 1
+
+    @property
+    def resolution(self) -> Optional[float]:
+        """
+        Native record interval in seconds, e.g. 86400 for daily means and 3600 for hourly data. None for static fields.
+        """
+        if self.times.shape[0] <= 1:
+            return None
+        return float(np.median(np.diff(self.times)))
+
+    def Interval(self, index: int) -> Tuple[float, float]:
+        """
+        The times during which a record is the nearest one, as returned by Index: every t with start < t <= end.
+
+        :param index: Record index.
+        :return: Tuple of (start, end) in epoch seconds. Unbounded before the first and after the last record.
+        """
+        n = self.times.shape[0]
+        start = -np.inf if index <= 0 else (self.times[index-1] + self.times[index]) / 2
+        end = np.inf if index >= n - 1 else (self.times[index] + self.times[index+1]) / 2
+        return float(start), float(end)
+
+    def At(self, t: float) -> np.ndarray:
+        """
+        The field at time t, linear between records and held at the first or last record outside them.
+
+        :param t: Time, in epoch seconds.
+        :return: float32 array of shape (lat, lon, components).
+        """
+        n = self.times.shape[0]
+        if n <= 1 or t <= self.times[0]:
+            return self.values[0]
+        if t >= self.times[-1]:
+            return self.values[-1]
+        i = int(np.searchsorted(self.times, t, side="right")) - 1
+        w = np.float32((t - self.times[i]) / (self.times[i+1] - self.times[i]))
+        return self.values[i] + w * (self.values[i+1] - self.values[i])
+
+    def Snapshot(self, index: int) -> xr.Dataset:
+        """
+        A single record as an xarray Dataset, in the same layout the fetchers return.
+
+        :param index: Record index.
+        """
+        coords = {"latitude": self.lats, "longitude": self.lons}
+        if self.times.shape[0]:
+            coords["time"] = np.datetime64(0, "ns") + np.timedelta64(int(round(self.times[index])), "s")
+        return xr.Dataset({n: (("latitude", "longitude"), self.values[index, ..., k]) for k, n in enumerate(self.names)}, coords=coords)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attachments are always tracked. Child processes share their parent's resource tracker,
+        # so this is harmless for pool workers: the block is still only freed by the publisher.
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedWindow:
+    """
+    Handle to a ForcingWindow published into shared memory, held by the publishing process.
+
+    'spec' is a small picklable description of the blocks, passed to other processes for 'ForcingWindow.Attach'.
+    The blocks are freed by Close(), which must only be called once every attached process is done with them.
+    """
+
+    def __init__(self, spec: dict, blocks: List[shared_memory.SharedMemory]) -> None:
+        self.spec = spec
+        self.blocks = blocks
+
+    def Close(self) -> None:
+        """
+        Frees the shared memory blocks. Safe to call more than once.
+        """
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self) -> "SharedWindow":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.Close()
+
+
+class ForcingWindow:
+    """
+    The current, wind and depth fields of one run window, preloaded into memory.
+
+    Built once per simulation, so that no later step has to go back to the NetCDF files.
+    Besides each field on its own grid, the window holds 'forcing': current and wind stacked on one grid and time
+    axis (see 'Fuse'), so the environment finds both with one index computation per query.
+    A window can also be shared between processes without copying: published into shared memory with 'Publish'
+    and attached with 'Attach', or saved as .npy files with 'Save' and memory-mapped with 'Load'.
+    """
+    FIELDS = ("current", "wind", "depth", "forcing")
+    FORCING = ("uo", "vo", "eastward_wind", "northward_wind")
+    MANIFEST = "window.json"
+
+    def __init__(self, current: FieldSlab, wind: FieldSlab, depth: FieldSlab, start: datetime, end: datetime, forcing: Optional[FieldSlab] = None) -> None:
+        """
+        :param current: Surface current slab, components (uo, vo).
+        :param wind: Wind slab, components (eastward_wind, northward_wind).
+        :param depth: Static depth field, component (deptho).
+        :param start: Start of the window, padding included.
+        :param end: End of the window, padding included.
+        :param forcing: Fused slab from 'Fuse'. Built from current and wind if not given.
+        """
+        self.current = current
+        self.wind = wind
+        self.depth = depth
+        self.forcing = forcing if forcing is not None else self.Fuse(current, wind)
+        self.start = start
+        self.end = end
+        self._blocks = []   # Shared memory blocks backing the slabs, if attached.
+
+    @classmethod
+    def FromFetchers(cls, current_fetcher, wind_fetcher, depth_fetcher, start: datetime, end: datetime, bounds: Tuple[float, float, float, float]) -> "ForcingWindow":
+        """
+        Reads the time range [start, end] and the bounding box from each fetcher's dataset in one bulk read per field.
+
+        :param current_fetcher: A CurrentFetcher with its dataset loaded.
+        :param wind_fetcher: A WindFetcher with its dataset loaded.
+        :param depth_fetcher: A DepthFetcher with its dataset loaded.
+        :param start: Start of the window.
+        :param end: End of the window.
+        :param bounds: Tuple[min_lat, max_lat, min_lon, max_lon]
+        :return: A new ForcingWindow.
+        """
+        current = FieldSlab.FromDataset(current_fetcher.SurfaceCurrentsRange(start, end, *bounds), ("uo", "vo"))
+        wind = FieldSlab.FromDataset(wind_fetcher.WindDataRange(start, end, *bounds), ("eastward_wind", "northward_wind"))
+        depth = FieldSlab.FromDataset(depth_fetcher.DepthData(*bounds), ("deptho",))
+        return cls(current, wind, depth, start, end)
+
+    @classmethod
+    def Fuse(cls, current: FieldSlab, wind: FieldSlab) -> FieldSlab:
+        """
+        Regrids current and wind once onto a common grid and time axis, stacked as components (uo, vo,
+        eastward_wind, northward_wind).
+
+        The grid is the current's (1/12 degree, finer than the wind's 0.125 degree), and the time axis is every record
+        time of either field. Current values on the current's own grid only gain the float32 rounding of the time
+        blend. Wind is interpolated bilinearly onto the current grid, so sampling the fused slab interpolates it
+        twice: this is exact only for wind that is bilinear in latitude and longitude, and otherwise smooths it, by up
+        to a fraction of the change between neighbouring wind grid points (see tests/FusedForcing.py). Land stays NaN
+        in the current components only.
+
+        :param current: Surface current slab.
+        :param wind: Wind slab.
+        :return: A new (time, lat, lon, 4) FieldSlab.
+        """
+        times = np.union1d(current.times, wind.times)
+        same_grid = np.array_equal(current.lats, wind.lats) and np.array_equal(current.lons, wind.lons)
+        if not same_grid:
+            sampler = create_sampler(wind.times, wind.lats, wind.lons, wind.values)
+            lats, lons = np.meshgrid(current.lats, current.lons, indexing="ij")
+
+        values = np.empty((max(times.shape[0], 1), current.lats.shape[0], current.lons.shape[0], 4), dtype=np.float32)
+        for k, t in enumerate(times if times.shape[0] else [0.0]):
+            values[k, ..., 0:2] = current.At(t)
+            values[k, ..., 2:4] = wind.At(t) if same_grid else sampler.Sample(t, lats, lons)
+        return FieldSlab(times, current.lats, current.lons, values, cls.FORCING)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.FIELDS)
+
+    def Covers(self, date: datetime) -> bool:
+        """
+        Checks whether a date falls inside the preloaded window.
+        """
+        return self.start <= date <= self.end
+
+    def _axes(self, name: str) -> dict:
+        slab = getattr(self, name)
+        return {"shape": list(slab.values.shape), "times": slab.times.tolist(), "lats": slab.lats.tolist(), "lons": slab.lons.tolist(), "names": list(slab.names)}
+
+    @staticmethod
+    def _slab(axes: dict, values: np.ndarray) -> FieldSlab:
+        values.flags.writeable = False
+        return FieldSlab(axes["times"], axes["lats"], axes["lons"], values, axes["names"])
+
+    def Publish(self) -> SharedWindow:
+        """
+        Copies the fields into shared memory blocks, once.
+
+        :return: Handle holding the blocks. Pass its 'spec' to 'Attach' in other processes, and Close it when they are done.
+        """
+        spec = {"start": self.start, "end": self.end, "fields": {}}
+        blocks = []
+        try:
+            for name in self.FIELDS:
+                slab = getattr(self, name)
+                block = shared_memory.SharedMemory(create=True, size=max(slab.nbytes, 1))
+                blocks.append(block)
+                np.ndarray(slab.values.shape, dtype=np.float32, buffer=block.buf)[...] = slab.values
+                spec["fields"][name] = dict(self._axes(name), block=block.name)
+        except BaseException:
+            SharedWindow(spec, blocks).Close()
+            raise
+        return SharedWindow(spec, blocks)
+
+    @classmethod
+    def Attach(cls, spec: dict) -> "ForcingWindow":
+        """
+        Builds a window on shared memory published by another process. The field arrays are read-only views of the
+        shared blocks, so nothing is copied.
+
+        :param spec: 'SharedWindow.spec' from the publishing process.
+        :return: A new ForcingWindow.
+        """
+        blocks, slabs = [], {}
+        for name in cls.FIELDS:
+            axes = spec["fields"][name]
+            block = _attach(axes["block"])
+            blocks.append(block)
+            slabs[name] = cls._slab(axes, np.ndarray(tuple(axes["shape"]), dtype=np.float32, buffer=block.buf))
+        window = cls(slabs["current"], slabs["wind"], slabs["depth"], spec["start"], spec["end"], slabs["forcing"])
+        window._blocks = blocks
+        return window
+
+    def Save(self, directory: str) -> str:
+        """
+        Writes the fields to a directory of .npy files and a manifest, for 'Load'.
+
+        :param directory: Target directory.
+        :return: The directory written to.
+        """
+        os.makedirs(directory, exist_ok=True)
+        manifest = {"start": self.start.isoformat(), "end": self.end.isoformat(), "fields": {}}
+        for name in self.FIELDS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name).values)
+            manifest["fields"][name] = self._axes(name)
+        with open(os.path.join(directory, self.MANIFEST), "w") as file:
+            json.dump(manifest, file)
+        return directory
+
+    @classmethod
+    def Load(cls, directory: str, mmap: bool = True) -> "ForcingWindow":
+        """
+        Loads a window written by 'Save'.
+
+        :param directory: Directory written by Save().
+        :param mmap: Memory-map the field files read-only instead of reading them. Processes mapping the same files share one copy in the page cache.
+        :return: A new ForcingWindow.
+        """
+        with open(os.path.join(directory, cls.MANIFEST)) as file:
+            manifest = json.load(file)
+        slabs = {name: cls._slab(manifest["fields"][name], np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None))
+                 for name in cls.FIELDS}
+        return cls(slabs["current"], slabs["wind"], slabs["depth"], datetime.fromisoformat(manifest["start"]), datetime.fromisoformat(manifest["end"]), slabs["forcing"])
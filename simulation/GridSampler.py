@@ -0,0 +1,173 @@
+import math
+from typing import Tuple, Union
+import numpy as np
+
+
+def uniform_step(axis: np.ndarray, tolerance: float = 1e-3) -> Union[float, None]:
+    """
+    The spacing of an evenly spaced axis.
+
+    :param axis: Coordinate axis, ascending or descending.
+    :param tolerance: Allowed deviation of any spacing from the mean, as a fraction of the mean.
+    :return: The mean spacing, or None if the axis has fewer than two points or is not evenly spaced.
+    """
+    if axis.shape[0] < 2:
+        return None
+    steps = np.diff(axis)
+    step = float(steps.mean())
+    if step == 0 or np.abs(steps - step).max() > tolerance * abs(step):
+        return None
+    return step
+
+
+class UniformGridSampler:
+    """
+    Space-time linear interpolation on an evenly spaced latitude/longitude grid.
+
+    Cell indices are computed arithmetically from the grid origin and spacing, with no search or input validation,
+    and the four surrounding grid points of the two records around time t are blended. Points outside the grid are
+    extrapolated linearly, as the scipy interpolator it replaces does. Times outside the records are held at the
+    nearest record.
+
+    NaN grid points, such as land in the Copernicus current products, are left out of the blend and the remaining
+    weights renormalized, so a point next to the coast takes the value of its nearest ocean neighbours. A point with
+    no valid neighbour is NaN.
+    """
+
+    def __init__(self, times: np.ndarray, lats: np.ndarray, lons: np.ndarray, values: np.ndarray) -> None:
+        """
+        :param times: Record times, in epoch seconds. May have a single record.
+        :param lats: Evenly spaced latitude axis.
+        :param lons: Evenly spaced longitude axis.
+        :param values: Array of shape (records, lat, lon, components). Not copied.
+        """
+        self.times = np.asarray(times, dtype=np.float64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.values = values
+        self.lat_step = uniform_step(self.lats)
+        self.lon_step = uniform_step(self.lons)
+        if self.lat_step is None or self.lon_step is None:
+            raise ValueError("Error: UniformGridSampler needs evenly spaced latitude and longitude axes, with at least two points each.")
+        records, ny, nx, components = values.shape
+        if records != max(self.times.shape[0], 1) or ny != self.lats.shape[0] or nx != self.lons.shape[0]:
+            raise ValueError("Error: Grid axes do not match the shape of the values.")
+        self._flat = values.reshape(records, ny*nx, components)
+        self._offsets = np.array([0, 1, nx, nx + 1])
+
+    def _records(self, t: float) -> Tuple[int, int, float]:
+        # The two records around t, and the weight of the second.
+        n = self.times.shape[0]
+        if n <= 1 or t <= self.times[0]:
+            return 0, 0, 0.0
+        if t >= self.times[-1]:
+            return n - 1, n - 1, 0.0
+        i = int(np.searchsorted(self.times, t, side="right")) - 1
+        return i, i + 1, (t - self.times[i]) / (self.times[i+1] - self.times[i])
+
+    @staticmethod
+    def _blend(weights: np.ndarray, corners: np.ndarray) -> np.ndarray:
+        # Weighted sum of (N, K) weights and (N, K, C) corners, leaving out NaN corners.
+        missing = np.isnan(corners)
+        if not missing.any():
+            return np.einsum("nk,nkc->nc", weights, corners)
+        w = np.where(missing, 0.0, weights[:, :, None])
+        total = w.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = np.einsum("nkc,nkc->nc", w, np.where(missing, 0.0, corners)) / total
+        out[np.abs(total) < 1e-12] = np.nan
+        return out
+
+    def _sample_point(self, t: float, lat: float, lon: float) -> np.ndarray:
+        # Scalar path: slices the 2x2 block around the point directly, avoiding per-point array overhead.
+        fy = (lat - self.lats[0]) / self.lat_step
+        fx = (lon - self.lons[0]) / self.lon_step
+        iy = min(max(math.floor(fy), 0), self.lats.shape[0] - 2)
+        ix = min(max(math.floor(fx), 0), self.lons.shape[0] - 2)
+        wy = fy - iy
+        wx = fx - ix
+        weights = np.array([(1-wy)*(1-wx), (1-wy)*wx, wy*(1-wx), wy*wx])
+        first, second, wt = self._records(t)
+        corners = self.values[first, iy:iy+2, ix:ix+2].reshape(1, 4, -1).astype(np.float64)
+        if wt:
+            corners = np.concatenate((corners, self.values[second, iy:iy+2, ix:ix+2].reshape(1, 4, -1)), axis=1)
+            weights = np.concatenate((weights*(1-wt), weights*wt))
+        return self._blend(weights[None, :], corners)[0]
+
+    def Sample(self, t: float, lats, lons) -> np.ndarray:
+        """
+        Samples every component at time t.
+
+        :param t: Time, in epoch seconds.
+        :param lats: Latitude, scalar or array.
+        :param lons: Longitude, scalar or array of the same shape.
+        :return: float64 array of shape lats.shape + (components,).
+        """
+        if np.ndim(lats) == 0:
+            return self._sample_point(t, float(lats), float(lons))
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        shape = lats.shape
+        fy = (lats.reshape(-1) - self.lats[0]) / self.lat_step
+        fx = (lons.reshape(-1) - self.lons[0]) / self.lon_step
+        iy = np.clip(np.floor(fy), 0, self.lats.shape[0] - 2).astype(np.intp)
+        ix = np.clip(np.floor(fx), 0, self.lons.shape[0] - 2).astype(np.intp)
+        wy = fy - iy
+        wx = fx - ix
+        # Weights of the corners (y, x), (y, x+1), (y+1, x), (y+1, x+1).
+        weights = np.empty((fy.shape[0], 4))
+        np.multiply(1 - wy, 1 - wx, out=weights[:, 0])
+        np.multiply(1 - wy, wx, out=weights[:, 1])
+        np.multiply(wy, 1 - wx, out=weights[:, 2])
+        np.multiply(wy, wx, out=weights[:, 3])
+        cells = (iy*self.lons.shape[0] + ix)[:, None] + self._offsets
+
+        first, second, wt = self._records(t)
+        if wt:
+            # The two records are adjacent, so both are gathered in one pass over a (2*lat*lon, C) view.
+            cells = np.concatenate((cells, cells + self._flat.shape[1]), axis=1)
+            weights = np.concatenate((weights*(1-wt), weights*wt), axis=1)
+            corners = self._flat[first:first+2].reshape(-1, self._flat.shape[2]).take(cells, axis=0)
+        else:
+            corners = self._flat[first].take(cells, axis=0)
+        out = self._blend(weights, corners.astype(np.float64))
+        return out.reshape(shape + (out.shape[-1],))
+
+
+class ScipyGridSampler:
+    """
+    Fallback for grids that are not evenly spaced. Same interface as UniformGridSampler, using scipy's
+    RegularGridInterpolator. NaN grid points are not treated specially.
+    """
+
+    def __init__(self, times: np.ndarray, lats: np.ndarray, lons: np.ndarray, values: np.ndarray) -> None:
+        from scipy.interpolate import RegularGridInterpolator  # Only needed for uneven grids.
+
+        times = np.asarray(times, dtype=np.float64)
+        if times.shape[0] <= 1:
+            # Linear interpolation needs two records per axis. Hold the single record constant.
+            t0 = times[0] if times.shape[0] else 0.0
+            times = np.array([t0, t0 + 1.0])
+            values = np.concatenate((values, values))
+        self.times = times
+        self.values = values
+        self.interpolator = RegularGridInterpolator((times, lats, lons), values, bounds_error=False, fill_value=None)
+
+    def Sample(self, t: float, lats, lons) -> np.ndarray:
+        """
+        Samples every component at time t. Times outside the records are held at the nearest record.
+        """
+        t = min(max(t, self.times[0]), self.times[-1])
+        return self.interpolator((t, lats, lons))
+
+
+Sampler = Union[UniformGridSampler, ScipyGridSampler]
+
+
+def create_sampler(times: np.ndarray, lats: np.ndarray, lons: np.ndarray, values: np.ndarray) -> Sampler:
+    """
+    A UniformGridSampler if the latitude and longitude axes are evenly spaced, otherwise a ScipyGridSampler.
+    """
+    if uniform_step(np.asarray(lats, dtype=np.float64)) is not None and uniform_step(np.asarray(lons, dtype=np.float64)) is not None:
+        return UniformGridSampler(times, lats, lons, values)
+    return ScipyGridSampler(times, lats, lons, values)
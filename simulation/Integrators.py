@@ -0,0 +1,174 @@
+"""
+Time integrators for victim drift.
+
+Each integrator advances a 'system' by one step. The system is a VictimEnsemble, a Victim (as a one-member state),
+or anything with the same methods:
+- Forcing(lat, lon, vel) -> (w, c): water velocity w (N, 2) and drag rate c (N,), so that dv/dt = c * (w - v).
+- Derivative(y) -> (N, 4): time derivative of the state y = [lat, lon, u, v].
+- PositionRate(lat, vel) -> (dlat/dt, dlon/dt), in degrees per second.
+- Metric(y) -> (N, 4): factors converting each state component to SI units (meters, m/s).
+- State() -> (N, 4): the current state, for 'advance'.
+
+The default 'euler' integrator is the F/A/V/X chain of the system itself, and is only stable for small steps.
+These allow much larger ones. 'analytic' is exact for forcing held constant over a step, and is meant to be run
+with one step per environment sample. 'advance' runs any of them over one simulation tick.
+"""
+
+from typing import Callable, Optional, Tuple
+import numpy as np
+
+# Dormand-Prince 5(4) tableau.
+_DP_A = (
+    (),
+    (1/5,),
+    (3/40, 9/40),
+    (44/45, -56/15, 32/9),
+    (19372/6561, -25360/2187, 64448/6561, -212/729),
+    (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+    (35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84),
+)
+_DP_E = (71/57600, 0.0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40)
+
+
+def semi_implicit(system, y: np.ndarray, dt: float) -> np.ndarray:
+    """
+    Drag treated implicitly: v' = (v + dt*c*w) / (1 + dt*c), with the drag rate c frozen over the step.
+    Relaxes toward the water velocity without overshoot for any step size.
+    """
+    w, c = system.Forcing(y[:, 0], y[:, 1], y[:, 2:])
+    cdt = (c * dt)[:, None]
+    out = np.empty_like(y)
+    out[:, 2:] = (y[:, 2:] + cdt * w) / (1.0 + cdt)
+    d_lat, d_lon = system.PositionRate(y[:, 0], out[:, 2:])
+    out[:, 0] = y[:, 0] + dt * d_lat
+    out[:, 1] = y[:, 1] + dt * d_lon
+    return out
+
+
+def analytic(system, y: np.ndarray, dt: float) -> np.ndarray:
+    """
+    Exact update for drag toward a water velocity held constant over the step. One environment query per step.
+
+    With r = w - v, the model gives dr/dt = -c0 * r / (1 + c0*t), where c0 is the drag rate at the start of the step.
+    So v(t) = w - r0 / (1 + c0*t), and the displacement is w*t - r0 * ln(1 + c0*t) / c0.
+    The displacement is converted to degrees at the starting latitude.
+    """
+    w, c = system.Forcing(y[:, 0], y[:, 1], y[:, 2:])
+    r0 = w - y[:, 2:]
+    factor = 1.0 + c * dt
+    if np.any(factor <= 0):
+        raise ValueError("Error: Drag model diverges over the step. Check that drag coefficients are below 1.")
+    safe_c = np.where(c != 0, c, 1.0)
+    decay = np.where(c != 0, np.log(factor) / safe_c, dt)
+
+    out = np.empty_like(y)
+    out[:, 2:] = w - r0 / factor[:, None]
+    displacement = w * dt - r0 * decay[:, None]
+    d_lat, d_lon = system.PositionRate(y[:, 0], displacement)
+    out[:, 0] = y[:, 0] + d_lat
+    out[:, 1] = y[:, 1] + d_lon
+    return out
+
+
+def rk4(system, y: np.ndarray, dt: float) -> np.ndarray:
+    """
+    Classic fourth order Runge-Kutta. Four environment queries per step.
+    """
+    k1 = system.Derivative(y)
+    k2 = system.Derivative(y + (dt/2) * k1)
+    k3 = system.Derivative(y + (dt/2) * k2)
+    k4 = system.Derivative(y + dt * k3)
+    return y + (dt/6) * (k1 + 2*k2 + 2*k3 + k4)
+
+
+def rk45(system, y: np.ndarray, duration: float, dt: float, rtol: float, atol: float, record: Optional[Callable[[float, np.ndarray], None]] = None, max_steps: int = 100000) -> Tuple[np.ndarray, int]:
+    """
+    Adaptive Dormand-Prince 5(4) over a whole interval. One step size is shared by every member, and is chosen
+    so the largest error estimate across members stays within tolerance.
+    Members whose forcing is NaN, such as on a land cell, hold their state for the step, and are left out of the
+    error estimate.
+
+    :param y: Initial state, (N, 4).
+    :param duration: Length of the interval, in seconds.
+    :param dt: Initial step size, in seconds.
+    :param rtol: Relative tolerance on velocity.
+    :param atol: Absolute tolerance, in m/s for velocity and meters for position.
+    :param record: Called after every accepted step with the time since the start of the interval, in seconds, and the state.
+    :param max_steps: Give up after this many attempted steps.
+    :return: Tuple of (final state, number of environment queries made).
+    """
+    t = 0.0
+    h = min(dt, duration)
+    k1 = system.Derivative(y)
+    queries = 1
+    attempts = 0
+    while duration - t > 1e-9 * duration:
+        attempts += 1
+        if attempts > max_steps:
+            raise RuntimeError(f"Error: Adaptive integrator did not finish the interval in {max_steps} steps.")
+        h = min(h, duration - t)
+        ks = [k1]
+        held = ~np.isfinite(k1).all(axis=1)
+        for i in range(1, 7):
+            stage = y + h * sum(a * k for a, k in zip(_DP_A[i], ks) if a)
+            held |= ~np.isfinite(stage).all(axis=1)
+            stage[held] = y[held]
+            ks.append(system.Derivative(stage))
+        queries += 6
+        y_new = stage  # The 7th stage is evaluated at the fifth order solution.
+
+        error = h * sum(e * k for e, k in zip(_DP_E, ks) if e)
+        metric = system.Metric(y)
+        scale = np.full_like(y, atol)
+        scale[:, 2:] += rtol * np.maximum(np.abs(y[:, 2:]), np.abs(y_new[:, 2:]))
+        ratio = np.abs(error * metric) / scale
+        ratio[held] = 0.0
+        err = float(np.sqrt(np.max(np.mean(ratio**2, axis=1)))) if ratio.size else 0.0
+
+        if err <= 1.0:
+            t += h
+            y = y_new
+            k1 = ks[6]
+            if record is not None:
+                record(t, y)
+                # The callback may change the state, e.g. deactivate members that left the bounds.
+                state = system.State()
+                if not np.array_equal(state, y):
+                    y = state
+                    k1 = system.Derivative(y)
+                    queries += 1
+        h *= min(5.0, max(0.2, 0.9 * (err ** -0.2 if err > 0 else 5.0)))
+    return y, queries
+
+
+FIXED_STEP = {"semi_implicit": semi_implicit, "rk4": rk4}
+INTEGRATORS = ("euler",) + tuple(FIXED_STEP) + ("rk45", "analytic")
+
+
+def advance(system, settings, dt: float, steps: int, record: Callable[[float, np.ndarray], None]) -> int:
+    """
+    Advances a system over one simulation tick with its 'integrator', any of INTEGRATORS but "euler".
+
+    :param system: The system, with an 'integrator' attribute.
+    :param settings: Settings snapshot, for the analytic samples per tick and the rk45 tolerances.
+    :param dt: Victim time step, in seconds.
+    :param steps: Victim time steps per tick. The tick lasts steps * dt, except for "analytic", which always covers
+                  'environment.settings.simulation_timedelta_minutes' in 'environment.settings.analytic_samples_per_tick' steps.
+    :param record: Called after every step with the time since the start of the tick, in seconds, and the new state.
+                   It must apply the state to the system: every step starts from system.State().
+    :return: Number of environment queries made.
+    """
+    if system.integrator == "analytic":
+        samples = max(settings.get_int("environment.settings.analytic_samples_per_tick"), 1)
+        h = settings.get_float("environment.settings.simulation_timedelta_minutes") * 60 / samples
+        for i in range(samples):
+            record((i + 1) * h, analytic(system, system.State(), h))
+        return samples
+    if system.integrator == "rk45":
+        _, queries = rk45(system, system.State(), steps * dt, dt, settings.get_float("environment.settings.integrator_rtol"),
+                          settings.get_float("environment.settings.integrator_atol"), record=record)
+        return queries
+    step_fn = FIXED_STEP[system.integrator]
+    for i in range(steps):
+        record((i + 1) * dt, step_fn(system, system.State(), dt))
+    return steps * (4 if system.integrator == "rk4" else 1)
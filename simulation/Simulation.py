@@ -1,36 +1,47 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, Optional
+import os
+import numpy as np
 
 from .Environment import Environment
-from .Visualizer import Visualizer
+from .ForcingWindow import ForcingWindow
 from .Victim import Victim
+from .VictimEnsemble import VictimEnsemble
 from application.config import Config
 from application.logger import Logger
+from application.profiler import TickProfiler
+
+if TYPE_CHECKING:
+    from .Visualizer import Visualizer
 
 logger = Logger(__name__).get()
 
 
 class Simulation:
 
-    def __init__(self, lat: float, lon: float, config_path: str, start_date:datetime, end_date:datetime):
+    def __init__(self, lat: float, lon: float, config_path: str, start_date:datetime, end_date:datetime, window:Optional[ForcingWindow]=None):
         self.lat = lat
         self.lon = lon
         self.config_path = config_path
-        self.config = Config(self.config_path)
+        self.config = Config.shared(self.config_path)
         
         self.start=start_date
         self.end=end_date
-        self.time_step=timedelta(minutes=float(self.config.get_value("environment.settings.simulation_timedelta_minutes")))
+        self.settings = self.config.snapshot()
+        Logger.configure(self.settings.get_str("application.logging.level"), self.settings.get_bool("application.logging.async_writes"))
+        self.time_step=timedelta(minutes=self.settings.get_float("environment.settings.simulation_timedelta_minutes"))
         self.date=self.start
+        self.profiler = TickProfiler(self.settings.get_bool("application.profiling.enabled"))
 
-        self.env = Environment(self.lat, self.lon, self.config_path, date=start_date)
+        self.env = Environment(self.lat, self.lon, self.config_path, date=start_date, end_date=end_date, window=window)
         self.currents=self.env.current_data
         self.depth=self.env.depth_data
         self.wind=self.env.wind_data
 
-        self.vis = Visualizer(self)
+        self._vis = None
 
         self.victims=[]
+        self.ensembles=[]
 
         self.current_step=0
         self.simulation_steps=self._calculate_steps()
@@ -38,6 +49,14 @@ class Simulation:
         logger.info({"message": "\033[32mSimulation initialized\033[0m"})
         logger.debug({"event": "simulation_object_created", "data": {"Center": (lat,lon), "StartDate":self.start.isoformat(), "EndDate":self.end.isoformat(), "TimeDelta":str(self.time_step), "VictimCount":len(self.victims), "NumSteps":self.simulation_steps}})
 
+    @property
+    def vis(self) -> "Visualizer":
+        # Built, and matplotlib and Cartopy imported, on first use. Runs that never draw pay for neither.
+        if self._vis is None:
+            from .Visualizer import Visualizer
+            self._vis = Visualizer(self)
+        return self._vis
+
     def _calculate_steps(self) -> int:
         current_time = self.start
         steps=0
@@ -49,17 +68,100 @@ class Simulation:
     def _add_victim(self, vic: Victim) -> None:
         self.victims.append(vic)
 
+    def _add_ensemble(self, ens: VictimEnsemble) -> None:
+        self.ensembles.append(ens)
+
+    def Positions(self):
+        """
+        Collects the positions of every victim, individual and ensemble.
+
+        :return: Tuple of (lats, lons) lists.
+        """
+        lats = [v.lat for v in self.victims]
+        lons = [v.lon for v in self.victims]
+        for ens in self.ensembles:
+            lats.extend(ens.lat.tolist())
+            lons.extend(ens.lon.tolist())
+        return lats, lons
+
     def Tick(self):
+        self.profiler.StartTick()
         self.date += self.time_step
         self.current_step+=1
-        self.env.Update(self.date)
-        for v in self.victims:
-            v.Update(self.current_step)
+        with self.profiler.Phase("refresh"):
+            self.env.Update(self.date)
+        with self.profiler.Phase("physics"):
+            for v in self.victims:
+                v.Update(self.current_step)
+            for ens in self.ensembles:
+                ens.Update(self.current_step)
         logger.info({"message": f"Tick at {self.date.strftime('%d%b%Y %H:%M:%S')}", "event": f"tick_{self.current_step}|{self.simulation_steps}", "data":{"date": self.date.isoformat()}})
         
+    def Rewind(self) -> None:
+        """
+        Moves the clock back to the start date. Victims keep their positions.
+        """
+        self.date = self.start
+        self.current_step = 0
+        self.env.Update(self.date)
+
+    def Close(self) -> None:
+        """
+        Releases the environment's open datasets.
+        """
+        self.env.Close()
+
+    def SaveProfile(self, path: Optional[str] = None) -> Optional[str]:
+        """
+        Ends the tick profile, and writes its summary. Does nothing if profiling is off or no tick has run.
+
+        :param path: Output file. Defaults to a file named by the current time in 'application.profiling.directory',
+                     in 'application.profiling.format'.
+        :return: The path written to, or None.
+        """
+        self.profiler.Finish()
+        if not self.profiler.ticks:
+            return None
+        if path is None:
+            name = f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{self.settings.get_str('application.profiling.format').lower()}"
+            path = os.path.join(self.settings.get_str("application.profiling.directory"), name)
+        self.profiler.Save(path)
+        summary = self.profiler.Summary()
+        logger.info({"message": f"Tick profile saved to \033[32m{path}\033[0m", "event": "simulation_profile", "data": {"file": path, "ticks": len(self.profiler.ticks), "mean": {name: stats["mean"] for name, stats in summary.items()}}})
+        return path
+
+    def run_headless(self, steps: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Advances the simulation without a visualizer, by looping Tick.
+
+        :param steps: Number of ticks. Defaults to the ticks left until the end date.
+        :return: Dictionary of summary arrays, over every victim, individual first, then each ensemble in order:
+                 - "time": (steps+1,) datetime64 of the start and every tick.
+                 - "lat", "lon": (steps+1, N) positions at those times.
+                 - "displacement": (N,) final displacement from the start position, in meters.
+        """
+        steps = max(self.simulation_steps - self.current_step, 0) if steps is None else steps
+        lats, lons = self.Positions()
+        lat = np.empty((steps+1, len(lats)))
+        lon = np.empty((steps+1, len(lons)))
+        lat[0], lon[0] = lats, lons
+        times = [self.date]
+        for i in range(1, steps+1):
+            self.Tick()
+            lat[i], lon[i] = self.Positions()
+            times.append(self.date)
+
+        self.SaveProfile()
+
+        displacement = [v.Displacement() for v in self.victims]
+        for ens in self.ensembles:
+            displacement.extend(ens.Displacement())
+        return {"time": np.array(times, dtype="datetime64[ns]"), "lat": lat, "lon": lon, "displacement": np.array(displacement, dtype=np.float64)}
+
     def Run(self, file: Optional[str] = None, static:bool = False):
         if static:
             self.vis.plot(0)
             self.vis.show()
         else:
             self.vis.run(file is None)
+        self.SaveProfile()
@@ -0,0 +1,209 @@
+from typing import Iterator, List, Optional
+import json
+import os
+import numpy as np
+
+
+class TrajectoryRecorder:
+    """
+    Records the (lat, lon) positions of a fixed number of objects into preallocated, chunked float64 arrays, with
+    the time of each row. Rows need not be evenly spaced in time: adaptive and per-tick integrators record at
+    irregular times.
+
+    Positions are written into a chunk of 'chunk_size' rows. When a chunk is full it is kept in memory, or, if a
+    directory is given, written to disk as a .npy file and dropped, so memory stays flat however long the run is.
+    Read a spilled trajectory a chunk at a time with Chunks(); Array() reads all of it into memory.
+    A saved trajectory is a directory of chunk files plus a 'trajectory.json' manifest, and can be loaded without
+    re-running the simulation.
+    """
+    MANIFEST = "trajectory.json"
+
+    def __init__(self, count: int, stride: int = 1, chunk_size: int = 4096, directory: Optional[str] = None) -> None:
+        """
+        :param count: Number of objects recorded per row.
+        :param stride: Record one row every 'stride' calls to Record().
+        :param chunk_size: Rows per chunk. One chunk of chunk_size * count * 16 bytes is allocated up front.
+        :param directory: If set, full chunks are spilled to this directory instead of kept in memory.
+        """
+        self.count = int(count)
+        self.stride = max(int(stride), 1)
+        self.chunk_size = max(int(chunk_size), 1)
+        self.directory = directory
+
+        self._chunks = []       # Full chunks kept in memory.
+        self._time_chunks = []  # Their row times.
+        self._spilled = 0       # Full chunks written to the directory.
+        self._current = np.empty((self.chunk_size, self.count, 2))
+        self._current_times = np.empty(self.chunk_size)
+        self._filled = 0
+        self._calls = 0
+        self.length = 0
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def __len__(self) -> int:
+        return self.length
+
+    @staticmethod
+    def _chunk_path(directory: str, index: int) -> str:
+        return os.path.join(directory, f"chunk_{index:06d}.npy")
+
+    @staticmethod
+    def _times_path(directory: str, index: int) -> str:
+        return os.path.join(directory, f"times_{index:06d}.npy")
+
+    def _finish_chunk(self) -> None:
+        if self.directory:
+            np.save(self._chunk_path(self.directory, self._spilled), self._current)
+            np.save(self._times_path(self.directory, self._spilled), self._current_times)
+            self._spilled += 1
+        else:
+            self._chunks.append(self._current)
+            self._time_chunks.append(self._current_times)
+        self._current = np.empty((self.chunk_size, self.count, 2))
+        self._current_times = np.empty(self.chunk_size)
+        self._filled = 0
+
+    def Record(self, lats, lons, time: float, force: bool = False) -> bool:
+        """
+        Records one row of positions, if this call falls on the recording stride.
+
+        :param lats: Latitude of each object. A scalar when count is 1.
+        :param lons: Longitude of each object. A scalar when count is 1.
+        :param time: Time of the positions, in seconds since the start of the run.
+        :param force: Record regardless of the stride.
+        :return: True if a row was written.
+        """
+        record = force or self._calls % self.stride == 0
+        self._calls += 1
+        if not record:
+            return False
+        row = self._current[self._filled]
+        row[:, 0] = lats
+        row[:, 1] = lons
+        self._current_times[self._filled] = time
+        self._filled += 1
+        self.length += 1
+        if self._filled == self.chunk_size:
+            self._finish_chunk()
+        return True
+
+    def Chunks(self) -> Iterator[np.ndarray]:
+        """
+        Every recorded row, a chunk at a time, without reading the whole trajectory into memory. Spilled chunks
+        are memory-mapped read-only, the rest are views of the chunks in memory.
+
+        :return: Iterator over arrays of shape (rows, count, 2), in recording order.
+        """
+        for i in range(self._spilled):
+            yield np.load(self._chunk_path(self.directory, i), mmap_mode="r")
+        yield from self._chunks
+        if self._filled:
+            yield self._current[:self._filled]
+
+    def Array(self) -> np.ndarray:
+        """
+        Every recorded row, copied into one in-memory array, spilled chunks included. For long spilled runs,
+        prefer Chunks().
+
+        :return: Array of shape (rows, count, 2).
+        """
+        parts = list(self.Chunks())
+        if not parts:
+            return np.empty((0, self.count, 2))
+        return np.concatenate(parts)
+
+    def Times(self) -> np.ndarray:
+        """
+        :return: Time of every recorded row, in seconds since the start of the run, shape (rows,).
+        """
+        parts = [np.load(self._times_path(self.directory, i)) for i in range(self._spilled)]
+        parts.extend(self._time_chunks)
+        parts.append(self._current_times[:self._filled])
+        return np.concatenate(parts)
+
+    def Last(self) -> np.ndarray:
+        """
+        :return: The most recently recorded row, shape (count, 2).
+        """
+        if self._filled:
+            return self._current[self._filled - 1]
+        if self._chunks:
+            return self._chunks[-1][-1]
+        if self._spilled:
+            return np.load(self._chunk_path(self.directory, self._spilled - 1), mmap_mode="r")[-1]
+        raise ValueError("Error: Trajectory is empty.")
+
+    def Save(self, directory: Optional[str] = None) -> str:
+        """
+        Writes the trajectory to a directory of chunk files and a manifest.
+
+        :param directory: Target directory. Defaults to the spill directory.
+        :return: The directory written to.
+        """
+        directory = directory or self.directory
+        if not directory:
+            raise ValueError("Error: No directory given to save the trajectory to.")
+        os.makedirs(directory, exist_ok=True)
+
+        chunks = self._spilled
+        if os.path.abspath(directory) != os.path.abspath(self.directory or ""):
+            chunks = 0
+            for i in range(self._spilled):
+                np.save(self._chunk_path(directory, chunks), np.load(self._chunk_path(self.directory, i)))
+                np.save(self._times_path(directory, chunks), np.load(self._times_path(self.directory, i)))
+                chunks += 1
+        for chunk, times in zip(self._chunks, self._time_chunks):
+            np.save(self._chunk_path(directory, chunks), chunk)
+            np.save(self._times_path(directory, chunks), times)
+            chunks += 1
+        if self._filled:
+            np.save(self._chunk_path(directory, chunks), self._current[:self._filled])
+            np.save(self._times_path(directory, chunks), self._current_times[:self._filled])
+            chunks += 1
+
+        with open(os.path.join(directory, self.MANIFEST), "w") as file:
+            json.dump({"count": self.count, "length": self.length, "stride": self.stride, "chunks": chunks}, file, indent=4)
+        return directory
+
+    @classmethod
+    def LoadChunks(cls, directory: str, mmap: bool = True) -> List[np.ndarray]:
+        """
+        Loads a saved trajectory as its chunks, in recording order.
+
+        :param directory: Directory written by Save().
+        :param mmap: Memory-map the chunk files read-only, so nothing is read until it is indexed. If False, every
+                     chunk is read into memory.
+        :return: List of arrays of shape (rows, count, 2).
+        """
+        with open(os.path.join(directory, cls.MANIFEST)) as file:
+            manifest = json.load(file)
+        mode = "r" if mmap else None
+        return [np.load(cls._chunk_path(directory, i), mmap_mode=mode) for i in range(manifest["chunks"])]
+
+    @classmethod
+    def LoadTimes(cls, directory: str) -> np.ndarray:
+        """
+        Loads the row times of a saved trajectory.
+
+        :param directory: Directory written by Save().
+        :return: Time of every row, in seconds since the start of the run, shape (rows,).
+        """
+        with open(os.path.join(directory, cls.MANIFEST)) as file:
+            manifest = json.load(file)
+        return np.concatenate([np.empty(0)] + [np.load(cls._times_path(directory, i)) for i in range(manifest["chunks"])])
+
+    @classmethod
+    def Load(cls, directory: str) -> np.ndarray:
+        """
+        Loads a saved trajectory into one in-memory array. For long trajectories, prefer LoadChunks().
+
+        :param directory: Directory written by Save().
+        :return: Array of shape (rows, count, 2).
+        """
+        parts = cls.LoadChunks(directory)
+        if not parts:
+            with open(os.path.join(directory, cls.MANIFEST)) as file:
+                return np.empty((0, json.load(file)["count"], 2))
+        return np.concatenate(parts)
@@ -0,0 +1,188 @@
+from datetime import datetime
+from typing import Optional, Tuple
+import numpy as np
+
+from application.config import Config
+from application.logger import Logger
+from .ForcingWindow import ForcingWindow
+from .Simulation import Simulation
+from .VictimEnsemble import VictimEnsemble
+
+try:
+    import gymnasium
+    from gymnasium.vector.utils import batch_space
+    _VectorEnv = gymnasium.vector.VectorEnv
+    _SAME_STEP = gymnasium.vector.AutoresetMode.SAME_STEP
+except (ImportError, AttributeError):
+    # Gymnasium is optional: the "rl" extra, version 1.1 or later, which added AutoresetMode. Without it, or with an
+    # older version, the environment works the same, but has no spaces.
+    gymnasium = None
+    _VectorEnv = object
+    _SAME_STEP = "SameStep"
+
+logger = Logger(__name__).get()
+
+
+class VectorSearchEnv(_VectorEnv):
+    """
+    Many independent search episodes advanced in one batched step, with the Gymnasium vector environment API.
+
+    Each sub-environment has one searcher and 'search.victims_per_env' drifting victims. Every step the searcher
+    moves with the given velocity for one simulation tick, the victims drift, and each victim that comes within
+    'search.detection_radius' of its searcher is detected.
+
+    All sub-environments share one 'Simulation' clock and environment, and all their victims are stacked in one
+    'VictimEnsemble', so a step costs one ensemble update and a few array operations however many
+    sub-environments there are. Nothing is drawn and no Visualizer is created.
+
+    Spaces, per sub-environment:
+    - action: searcher velocity (east, north), in [-1, 1], scaled by 'search.searcher_speed'.
+    - observation: float32 vector of the searcher's (north, east) offset from the center, each victim's (north, east)
+      offset from the searcher, all in km, each victim's detected flag, and the fraction of the episode elapsed.
+
+    Sub-environments reset automatically in the step that ends them; the last observation of the finished episode
+    is in info["final_obs"], masked by info["_final_obs"]. When the shared clock reaches the end date it is moved back
+    to the start, and every episode is truncated.
+
+    Every logger is set to 'search.log_level' once the simulation is created, so the per-tick records of a
+    simulation stay out of training runs.
+    """
+    metadata = {"autoreset_mode": _SAME_STEP}
+    render_mode = None
+
+    def __init__(self, config_path: str, num_envs: int, lat: float, lon: float, start_date: datetime, end_date: datetime,
+                 seed: Optional[int] = None, window: Optional[ForcingWindow] = None) -> None:
+        """
+        :param config_path: Path to the JSON configuration file. Must be an absolute path.
+        :param num_envs: Number of sub-environments.
+        :param lat: Latitude of the search area's center. Victims start within 'search.spawn_range_miles' of it.
+        :param lon: Longitude of the search area's center.
+        :param start_date: Start of the shared clock.
+        :param end_date: End of the shared clock.
+        :param seed: Seed for victim placement.
+        :param window: Optional preloaded 'ForcingWindow', passed on to the simulation.
+        """
+        self.config_path = config_path
+        self.config = Config.shared(self.config_path)
+        self.settings = self.config.snapshot()
+        self.num_envs = int(num_envs)
+        self.victims = self.settings.get_int("search.victims_per_env")
+        self.speed = self.settings.get_float("search.searcher_speed")
+        self.radius = self.settings.get_float("search.detection_radius")
+        self.spawn_range = np.degrees(self.settings.get_float("search.spawn_range_miles") / 3963.0)
+        self.max_steps = self.settings.get_int("search.max_episode_steps")
+        self.earth_rad = self.settings.get_float("environment.constants.earth_radius")
+        self.center = np.array([lat, lon], dtype=np.float64)
+        self.rng = np.random.default_rng(seed)
+
+        self.sim = Simulation(lat, lon, config_path, start_date, end_date, window=window)
+        # Simulation applies 'application.logging.level'; every step ticks it, so training gets its own level.
+        Logger.configure(self.settings.get_str("search.log_level"))
+        self.tick_seconds = self.sim.time_step.total_seconds()
+        n = self.num_envs * self.victims
+        lats, lons = self._spawn(n)
+        types = self.rng.choice(["piw", "piw_lj"], n).tolist()
+        self.ensemble = VictimEnsemble(np.full(n, 0.5), np.full(n, 0.5), np.ones(n), lats, lons, types, self.sim.env, config_path, record=False)
+        self.sim._add_ensemble(self.ensemble)
+
+        self.searcher = np.tile(self.center, (self.num_envs, 1))
+        self.found = np.zeros((self.num_envs, self.victims), dtype=bool)
+        self.episode_steps = np.zeros(self.num_envs, dtype=np.int64)
+
+        size = 3 + 3*self.victims
+        if gymnasium is not None:
+            self.single_observation_space = gymnasium.spaces.Box(-np.inf, np.inf, (size,), np.float32)
+            self.single_action_space = gymnasium.spaces.Box(-1.0, 1.0, (2,), np.float32)
+            self.observation_space = batch_space(self.single_observation_space, self.num_envs)
+            self.action_space = batch_space(self.single_action_space, self.num_envs)
+        logger.debug({"event": "vector_search_env_created", "data": {"num_envs": self.num_envs, "victims_per_env": self.victims, "observation_size": size, "ticks": self.sim.simulation_steps}})
+
+    def _spawn(self, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        offsets = self.rng.uniform(-self.spawn_range, self.spawn_range, (count, 2))
+        return self.center[0] + offsets[:, 0], self.center[1] + offsets[:, 1]
+
+    def _offsets(self, lat: np.ndarray, lon: np.ndarray, lat0: np.ndarray, lon0: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Local (north, east) offsets in meters. Exact enough at the scale of a search area.
+        north = np.radians(lat - lat0) * self.earth_rad
+        east = np.radians(lon - lon0) * self.earth_rad * np.cos(np.radians(lat0))
+        return north, east
+
+    def _victim_positions(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self.ensemble.lat.reshape(self.num_envs, self.victims), self.ensemble.lon.reshape(self.num_envs, self.victims)
+
+    def _observe(self) -> np.ndarray:
+        lats, lons = self._victim_positions()
+        north, east = self._offsets(lats, lons, self.searcher[:, 0:1], self.searcher[:, 1:2])
+        s_north, s_east = self._offsets(self.searcher[:, 0], self.searcher[:, 1], self.center[0], self.center[1])
+        obs = np.empty((self.num_envs, 3 + 3*self.victims), dtype=np.float32)
+        obs[:, 0] = s_north / 1000
+        obs[:, 1] = s_east / 1000
+        obs[:, 2:2+2*self.victims:2] = north / 1000
+        obs[:, 3:3+2*self.victims:2] = east / 1000
+        obs[:, 2+2*self.victims:2+3*self.victims] = self.found
+        obs[:, -1] = self.episode_steps / self.max_steps
+        return obs
+
+    def _reset_envs(self, envs: np.ndarray) -> None:
+        members = np.repeat(envs, self.victims)  # Victims of sub-environment i are members i*k to (i+1)*k-1.
+        lats, lons = self._spawn(int(members.sum()))
+        self.ensemble.Reset(members, lats, lons)
+        self.searcher[envs] = self.center
+        self.found[envs] = False
+        self.episode_steps[envs] = 0
+
+    def reset(self, *, seed: Optional[int] = None, options: Optional[dict] = None):
+        """
+        Rewinds the shared clock and starts a new episode in every sub-environment.
+
+        :param seed: Reseeds victim placement.
+        :return: Tuple of (observations, info).
+        """
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self.sim.Rewind()
+        self._reset_envs(np.ones(self.num_envs, dtype=bool))
+        return self._observe(), {}
+
+    def step(self, actions):
+        """
+        Advances every sub-environment by one simulation tick.
+
+        :param actions: (num_envs, 2) searcher velocities, (east, north) in [-1, 1].
+        :return: Tuple of (observations, rewards, terminations, truncations, info), stacked over sub-environments.
+                 The reward is the number of victims detected during the step.
+        """
+        velocity = np.clip(np.asarray(actions, dtype=np.float64).reshape(self.num_envs, 2), -1.0, 1.0) * self.speed
+        self.searcher[:, 0] += np.degrees(velocity[:, 1] * self.tick_seconds / self.earth_rad)
+        self.searcher[:, 1] += np.degrees(velocity[:, 0] * self.tick_seconds / (self.earth_rad * np.cos(np.radians(self.searcher[:, 0]))))
+
+        self.sim.Tick()
+        self.episode_steps += 1
+
+        lats, lons = self._victim_positions()
+        north, east = self._offsets(lats, lons, self.searcher[:, 0:1], self.searcher[:, 1:2])
+        detected = (north**2 + east**2 <= self.radius**2) & ~self.found
+        self.found |= detected
+        rewards = detected.sum(axis=1).astype(np.float32)
+
+        terminations = self.found.all(axis=1)
+        truncations = (self.episode_steps >= self.max_steps) & ~terminations
+        if self.sim.current_step >= self.sim.simulation_steps:
+            self.sim.Rewind()
+            truncations |= ~terminations
+
+        obs = self._observe()
+        info = {}
+        done = terminations | truncations
+        if done.any():
+            info["final_obs"] = obs.copy()
+            info["_final_obs"] = done
+            self._reset_envs(done)
+            obs[done] = self._observe()[done]
+        return obs, rewards, terminations, truncations, info
+
+    def close(self, **kwargs) -> None:
+        """
+        Releases the simulation's open datasets.
+        """
+        self.sim.Close()
@@ -1,11 +1,15 @@
 from typing import Dict, Optional, Tuple
 import numpy as np
-from scipy.interpolate import interp2d
 from datetime import timedelta
+import logging
+import os
 
-from application.logger import Logger
+from application.logger import Logger, Sampler, lazy
 from application.config import Config
 from simulation.Environment import Environment
+from simulation.Trajectory import TrajectoryRecorder
+from simulation.VictimEnsemble import VictimEnsemble
+from simulation import Integrators
 
 
 
@@ -20,26 +24,72 @@ class Victim:
         self.victim_type=self._parse_type(victim_type).lower()
         self.env=env
         self.config_path=config_path
-        self.config=Config(self.config_path)
+        self.config=Config.shared(self.config_path)
+        self.settings=self.config.snapshot()
         self.id = ID
-        self.dt = float(self.config.get_value("environment.settings.victim_timedelta_seconds")) # time delta in seconds.
+        self.dt = self.settings.get_float("environment.settings.victim_timedelta_seconds") # time delta in seconds.
+        self.integrator = self.settings.get_str("environment.settings.integrator").lower()
+        if self.integrator not in Integrators.INTEGRATORS:
+            raise ValueError(f"Error: Unknown integrator '{self.integrator}'. Must be one of {Integrators.INTEGRATORS}.")
 
-        self.logger = Logger(f"Simulation.Victim{self.id}", file_prefix=f"victim{self.id}").get()
+        self.log = self._create_logger()
+        self.logger = self.log.get()
+        # Per-step records are gated once per sub-step; payloads are only built when a record is let through.
+        self.log_sampler = Sampler(self.settings.get_int("application.logging.sample_every"))
+        self._log_step = self.log_debug
 
         #self.density = float(self.config.get_value(f"victims.{self.type}.density"))
         #self.volume = (4/3)*self.pi*self.x*self.y*self.z
         #self.mass = self.density * self.volume
-        self.pi = float(self.config.get_value("environment.constants.pi"))        
-        self.mass = float(self.config.get_value(f"victims.{self.victim_type}.avg_mass"))
+        self.pi = self.settings.get_float("environment.constants.pi")
+        self.rho_water = self.settings.get_float("environment.constants.water_density")
+        self.earth_rad = self.settings.get_float("environment.constants.earth_radius")
+        self.mass = self.settings.get_float(f"victims.{self.victim_type}.avg_mass")
 
-        self.drag_coeff = float(self.config.get_value(f"victims.{self.victim_type}.drag_coefficient"))
+        self.drag_coeff = self.settings.get_float(f"victims.{self.victim_type}.drag_coefficient")
 
-        self.path = [self.start]
+        self.elapsed = 0.0  # Seconds since the victim was created.
+        self.trajectory = self._create_trajectory()
+        self.trajectory.Record(self.lat, self.lon, self.elapsed, force=True)
         self.position = [self.lat, self.lon]
         self.velocity=np.array(self._get_vectors()["net_current"])
-        self.logger.debug({"event": "victim_object_created", "data": {"id": self.id, "size":(x,y,z), "position":self.start, "velocity":str(self.velocity), "type":self.victim_type, "timedelta":self.dt, "mass":self.mass, "drag_coeff":self.drag_coeff}})
+        self.logger.debug({"victim": self.id, "event": "victim_object_created", "data": {"id": self.id, "size":(x,y,z), "position":self.start, "velocity":str(self.velocity), "type":self.victim_type, "timedelta":self.dt, "mass":self.mass, "drag_coeff":self.drag_coeff}})
         print(f"Victim {self.id} init running.")
 
+    @property
+    def log_debug(self) -> bool:
+        # Checked on every use, so a later Logger.configure applies to existing victims.
+        return self.log.enabled(logging.DEBUG)
+
+    def _create_logger(self) -> Logger:
+        """
+        Per-victim log files by default. With 'application.logging.victim_files' set to "shared", victims write
+        to one stream, or to 'application.logging.victim_shards' streams, and records are told apart by their "victim" field.
+        """
+        if self.settings.get_str("application.logging.victim_files") == "shared":
+            shards = max(self.settings.get_int("application.logging.victim_shards"), 1)
+            if shards == 1:
+                return Logger("Simulation.Victims", file_prefix="victims")
+            shard = self.id % shards
+            return Logger(f"Simulation.Victims{shard}", file_prefix=f"victims{shard}")
+        return Logger(f"Simulation.Victim{self.id}", file_prefix=f"victim{self.id}")
+
+    def _create_trajectory(self) -> TrajectoryRecorder:
+        # Spilled to a subdirectory named by the environment's run ID, so victim IDs only need to be unique within a run.
+        directory = self.settings.get_str("environment.settings.trajectory_directory")
+        return TrajectoryRecorder(1, stride=self.settings.get_int("environment.settings.trajectory_stride"), chunk_size=self.settings.get_int("environment.settings.trajectory_chunk_size"),
+                                  directory=os.path.join(directory, self.env.run_id, f"victim_{self.id}") if directory else None)
+
+    @property
+    def path(self):
+        """Recorded (lat, lon) positions, as a list of tuples."""
+        return [tuple(p) for p in self.trajectory.Array()[:, 0].tolist()]
+
+    @property
+    def path_times(self) -> np.ndarray:
+        """Time of each recorded position, in seconds since the victim was created."""
+        return self.trajectory.Times()
+
     def _parse_type(self, input_type:str) -> str:
         allowed_types= ["piw","piw_lj"]
         if input_type.lower() not in allowed_types:
@@ -48,7 +98,7 @@ class Victim:
         else: return input_type
 
     def _simulation_steps(self) -> int:
-        simulation_timestep = timedelta(minutes=float(self.config.get_value("environment.settings.simulation_timedelta_minutes")))
+        simulation_timestep = timedelta(minutes=self.settings.get_float("environment.settings.simulation_timedelta_minutes"))
         victim_timestep = timedelta(seconds=self.dt)
         return simulation_timestep // victim_timestep
 
@@ -59,11 +109,12 @@ class Victim:
 
     def _get_vectors(self):
         vector_dict = self.env.Query(self.lat, self.lon)
-        self.logger.debug({"event": f"victim_{self.id}_vector_fetch", "data":{"wind_vector": vector_dict["net_wind"], "current_vector": vector_dict["net_current"]}})
+        if self._log_step:
+            self.logger.debug({"victim": self.id, "event": f"victim_{self.id}_vector_fetch", "data":{"wind_vector": vector_dict["net_wind"], "current_vector": vector_dict["net_current"]}})
         return vector_dict
 
     def F(self, v_rel) -> np.array:
-        rho_water = float(self.config.get_value("environment.constants.water_density"))
+        rho_water = self.rho_water
         A = self._csa(self.x, self.z)
         # if np.linalg.norm(v_rel) > np.linalg.norm(v_water):
         #     v_rel=v_water
@@ -79,7 +130,8 @@ class Victim:
             F_drag = np.array([0.0,0.0])
 
         F_net = F_drive - F_drag
-        self.logger.debug({"message": f"Victim Forces - F_Drive:{F_drive}, F_Drag:{F_drag}, F_Net:{F_net}", "event": f"victim_{self.id}_force_calc", "data":{"water_density":rho_water, "victim_area":A, "F_drive":str(F_drive), "F_drag":str(F_drag), "F_net":str(F_net)}})
+        if self._log_step:
+            self.logger.debug(lazy(lambda: {"victim": self.id, "message": f"Victim Forces - F_Drive:{F_drive}, F_Drag:{F_drag}, F_Net:{F_net}", "event": f"victim_{self.id}_force_calc", "data":{"water_density":rho_water, "victim_area":A, "F_drive":str(F_drive), "F_drag":str(F_drag), "F_net":str(F_net)}}))
         return F_net
         
     def A(self, F: float) -> float:
@@ -91,17 +143,48 @@ class Victim:
         return new_v
 
     def X(self, V: np.ndarray):
-        earth_rad = float(self.config.get_value("environment.constants.earth_radius"))
+        earth_rad = self.earth_rad
         d_lat = (V[1] * self.dt) / earth_rad*(180/np.pi)
         d_lon = (V[0] * self.dt) / (earth_rad*np.cos(np.radians(self.lat)))*(180/np.pi)
         return self.lat+d_lat, self.lon+d_lon
 
+    def Forcing(self, lat: np.ndarray, lon: np.ndarray, vel: np.ndarray):
+        """
+        Water velocity and drag rate at a one-member state, for the integrators in 'Integrators'.
+        The acceleration is c * (w - vel), the same force as F() divided by mass.
+
+        :return: Tuple of (w, c): (1, 2) water velocity and (1,) drag rate in 1/s.
+        """
+        w = np.array([self.env.Query(float(lat[0]), float(lon[0]))["net_current"]])
+        speed = np.linalg.norm(w - vel, axis=1)
+        return w, (1.0 - self.drag_coeff) * self.rho_water * self._csa(self.x, self.z) * speed / self.mass
+
+    # To the integrators a victim is a one-member ensemble: only the forcing differs.
+    PositionRate = VictimEnsemble.PositionRate
+    Derivative = VictimEnsemble.Derivative
+    Metric = VictimEnsemble.Metric
+
+    def State(self) -> np.ndarray:
+        """
+        :return: (1, 4) state of [lat, lon, u, v].
+        """
+        return np.array([[self.lat, self.lon, self.velocity[0], self.velocity[1]]])
+
+    def _set_state(self, y: np.ndarray, step: int, elapsed: float) -> None:
+        self.elapsed = elapsed
+        self.lat, self.lon = np.float64(y[0, 0]), np.float64(y[0, 1])
+        self.velocity = y[0, 2:].copy()
+        self.position = (self.lat, self.lon)
+        if self.log_debug and self.log_sampler():
+            self.logger.debug(lazy(lambda: {"victim": self.id, "message": f"Victim position update: {self.position}", "step":step, "event":f"victim_{self.id}_position_update", "data":{"position": self.position, "velocity": str(self.velocity), "integrator": self.integrator, "displacement_from_start":self.Displacement()}}))
+        self.trajectory.Record(self.lat, self.lon, self.elapsed)
+
     def Displacement(self) -> float:
         """
         Calculate net displacement (in meters) from starting position.
         Uses Haversine Formula.
         """
-        earth_rad = float(self.config.get_value("environment.constants.earth_radius"))
+        earth_rad = self.earth_rad
 
         lat1, lon1 = map(float, self.start)
         lat2, lon2 = map(float, self.position)
@@ -115,21 +198,29 @@ class Victim:
         return earth_rad*c # Distance in meters
 
     def Update(self, step:int=-1):
+        if self.integrator != "euler":
+            start = self.elapsed
+            Integrators.advance(self, self.settings, self.dt, self._simulation_steps(), lambda t, y: self._set_state(y, step, start + t))
+            return
         steps = self._simulation_steps()
 
         for _ in range(steps):
+            self._log_step = self.log_debug and self.log_sampler()
             v_water = np.array(self._get_vectors()["net_current"])
             v_rel = v_water-self.velocity
 
             F_net = self.F(v_rel)
             A=self.A(F_net)
             self.velocity=self.V(A)
-            self.logger.debug({"message":f"Victim Velocity - v_water:{v_water}, v_relative:{v_rel}, v_victim:{self.velocity}", "step":step, "event": f"victim_{self.id}_velocity_update", "data":{"v_water":str(v_water), "v_rel":str(v_rel), "Force": str(F_net), "Acceleration": str(A), "Velocity": str(self.velocity)}})
+            if self._log_step:
+                self.logger.debug(lazy(lambda: {"victim": self.id, "message":f"Victim Velocity - v_water:{v_water}, v_relative:{v_rel}, v_victim:{self.velocity}", "step":step, "event": f"victim_{self.id}_velocity_update", "data":{"v_water":str(v_water), "v_rel":str(v_rel), "Force": str(F_net), "Acceleration": str(A), "Velocity": str(self.velocity)}}))
             self.lat, self.lon = self.X(self.velocity)
 
             self.position = (self.lat, self.lon)
-            self.logger.debug({"message": f"Victim position update: {self.position}", "step":step, "event":f"victim_{self.id}_position_update", "data":{"position": self.position, "displacement_from_start":self.Displacement()}})
-            self.path.append(self.position)
+            self.elapsed += self.dt
+            if self._log_step:
+                self.logger.debug(lazy(lambda: {"victim": self.id, "message": f"Victim position update: {self.position}", "step":step, "event":f"victim_{self.id}_position_update", "data":{"position": self.position, "displacement_from_start":self.Displacement()}}))
+            self.trajectory.Record(self.lat, self.lon, self.elapsed)
 
         
         
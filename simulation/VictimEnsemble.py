@@ -0,0 +1,315 @@
+from typing import Iterable, Optional, Sequence
+from datetime import timedelta
+import os
+import numpy as np
+
+from application.logger import Logger, lazy
+from application.config import Config
+from simulation.Environment import Environment
+from simulation.Trajectory import TrajectoryRecorder
+from simulation import Integrators
+
+logger = Logger(__name__).get()
+
+
+class VictimEnsemble:
+    """
+    A group of victims advanced together.
+
+    Holds the state of every member in contiguous NumPy arrays and advances all of them with a single
+    batched F/A/V/X step, so the cost of a sub-step no longer scales with the number of Python objects.
+    The physics is identical to 'Victim'.
+    """
+
+    def __init__(self, x: Sequence[float], y: Sequence[float], z: Sequence[float], lat: Sequence[float], lon: Sequence[float], victim_types: Sequence[str], env: Environment, config_path: str, ids: Optional[Sequence[int]] = None, record: bool = True, directory: Optional[str] = None):
+        """
+        Initializes the ensemble. All per-victim arguments must have the same length.
+
+        :param x: Horizontal minor axis of each victim, in meters.
+        :param y: Lateral minor axis of each victim, in meters.
+        :param z: Major axis of each victim, in meters.
+        :param lat: Initial latitude of each victim.
+        :param lon: Initial longitude of each victim.
+        :param victim_types: Type of each victim. Must be one of the allowed types.
+        :param env: 'Environment' object.
+        :param config_path: Path to the JSON configuration file.
+        :param ids: Optional victim IDs. Defaults to 1..N.
+        :param record: Record trajectories. Turn off for long-running uses, like training, that never read the path.
+        :param directory: Directory to spill the trajectory to. Defaults to a subdirectory of
+                          'environment.settings.trajectory_directory' named by the environment's run ID, if that is set.
+        """
+        self.env = env
+        self.config_path = config_path
+        self.config = Config.shared(self.config_path)
+        self.settings = self.config.snapshot()
+        self.dt = self.settings.get_float("environment.settings.victim_timedelta_seconds")
+        self.pi = self.settings.get_float("environment.constants.pi")
+        self.rho_water = self.settings.get_float("environment.constants.water_density")
+        self.earth_rad = self.settings.get_float("environment.constants.earth_radius")
+        self.integrator = self.settings.get_str("environment.settings.integrator").lower()
+        if self.integrator not in Integrators.INTEGRATORS:
+            raise ValueError(f"Error: Unknown integrator '{self.integrator}'. Must be one of {Integrators.INTEGRATORS}.")
+
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.z = np.asarray(z, dtype=np.float64)
+        self.lat = np.asarray(lat, dtype=np.float64).copy()
+        self.lon = np.asarray(lon, dtype=np.float64).copy()
+        n = self.lat.shape[0]
+        if not all(a.shape == (n,) for a in (self.x, self.y, self.z, self.lon)) or len(victim_types) != n:
+            raise ValueError("Error: All per-victim arguments must be one-dimensional and of equal length.")
+        self.ids = np.arange(1, n+1) if ids is None else np.asarray(ids)
+
+        self.victim_types = [self._parse_type(t).lower() for t in victim_types]
+        self.mass = np.empty(n)
+        self.drag_coeff = np.empty(n)
+        for t in set(self.victim_types):
+            members = np.array([vt == t for vt in self.victim_types])
+            self.mass[members] = self.settings.get_float(f"victims.{t}.avg_mass")
+            self.drag_coeff[members] = self.settings.get_float(f"victims.{t}.drag_coefficient")
+        self.csa = self._csa(self.x, self.z)
+
+        self.start = np.column_stack((self.lat, self.lon))
+        self.active = np.ones(n, dtype=bool)
+        self.velocity = np.zeros((n, 2))
+        self.velocity = self._current_vectors()
+        self.elapsed = 0.0  # Seconds since the ensemble was created.
+        self.trajectory = None
+        if record:
+            if directory is None:
+                base = self.settings.get_str("environment.settings.trajectory_directory")
+                directory = os.path.join(base, self.env.run_id, f"ensemble_{self.ids[0]}-{self.ids[-1]}") if base else None
+            self.trajectory = TrajectoryRecorder(n, stride=self.settings.get_int("environment.settings.trajectory_stride"), chunk_size=self.settings.get_int("environment.settings.trajectory_chunk_size"), directory=directory)
+            self.trajectory.Record(self.lat, self.lon, self.elapsed, force=True)
+        logger.debug({"event": "victim_ensemble_created", "data": {"count": n, "types": sorted(set(self.victim_types)), "timedelta": self.dt}})
+
+    @classmethod
+    def FromVictims(cls, victims: Iterable, ids: Optional[Sequence[int]] = None) -> "VictimEnsemble":
+        """
+        Builds an ensemble from existing 'Victim' objects, taking their current position.
+
+        :param victims: 'Victim' objects sharing one environment and configuration file.
+        :return: A new VictimEnsemble.
+        """
+        victims = list(victims)
+        if not victims:
+            raise ValueError("Error: Cannot build an ensemble from an empty list of victims.")
+        first = victims[0]
+        return cls([v.x for v in victims], [v.y for v in victims], [v.z for v in victims],
+                   [v.lat for v in victims], [v.lon for v in victims], [v.victim_type for v in victims],
+                   first.env, first.config_path, ids=[v.id for v in victims] if ids is None else ids)
+
+    @classmethod
+    def Generate(cls, config: dict, env: Environment, config_path: str, rng: Optional[np.random.Generator] = None, directory: Optional[str] = None) -> "VictimEnsemble":
+        """
+        Builds a randomly perturbed ensemble. Takes the same configuration keys as 'generate_victims' in wrapper.py:
+        N, lat, lon, range_miles, xy_min, xy_max, z_min, z_max, victim_types, and the perturb_* flags.
+
+        :param config: Victim generation settings.
+        :param env: 'Environment' object.
+        :param config_path: Path to the JSON configuration file.
+        :param rng: Random generator. Pass a seeded one for reproducible scenarios.
+        :param directory: Directory to spill the trajectory to, see '__init__'.
+        :return: A new VictimEnsemble.
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        n = int(config.get('N', 10))
+        lat = config.get('lat', 30.1)
+        lon = config.get('lon', -80.0)
+        degrees = np.degrees(config.get('range_miles', 2) / 3963.0)
+
+        lats = lat + rng.uniform(-degrees, degrees, n) if config.get('perturb_lat', False) else np.full(n, lat)
+        lons = lon + rng.uniform(-degrees, degrees, n) if config.get('perturb_lon', False) else np.full(n, lon)
+        xy = rng.uniform(config.get('xy_min', 0.2), config.get('xy_max', 2), n) if config.get('perturb_xy', False) else np.full(n, 0.5)
+        z = rng.uniform(config.get('z_min', 0.5), config.get('z_max', 2), n) if config.get('perturb_z', False) else np.ones(n)
+        types = rng.choice(config.get('victim_types', ['piw', 'piw_lj']), n).tolist() if config.get('perturb_victim_type', False) else ['piw']*n
+        return cls(xy, xy, z, lats, lons, types, env, config_path, directory=directory)
+
+    def __len__(self) -> int:
+        return self.lat.shape[0]
+
+    def _parse_type(self, input_type: str) -> str:
+        allowed_types = ["piw", "piw_lj"]
+        if input_type.lower() not in allowed_types:
+            logger.critical({"message": f"\"{input_type}\" is not a valid victim type.", "event": "victim_type_error", "data": {"type": input_type, "allowed_types": allowed_types}})
+            raise ValueError("Invalid victim type. Please use a valid value.")
+        return input_type
+
+    def _simulation_steps(self) -> int:
+        simulation_timestep = timedelta(minutes=self.settings.get_float("environment.settings.simulation_timedelta_minutes"))
+        victim_timestep = timedelta(seconds=self.dt)
+        return simulation_timestep // victim_timestep
+
+    def _csa(self, x: np.ndarray, z: np.ndarray) -> np.ndarray:
+        # Same assumption as Victim._csa: orientation does not matter.
+        return self.pi*x*z
+
+    def _current_vectors(self) -> np.ndarray:
+        """
+        Samples the surface current at every member's position in one batched query.
+
+        Members that leave the environment bounds are deactivated: their velocity is zeroed and they hold
+        their last position for the rest of the run.
+
+        :return: (N, 2) array of (u, v) current vectors. Zero for inactive members.
+        """
+        vectors = self.env.QueryMany(self.lat, self.lon)
+        self._deactivate(~vectors["in_bounds"])
+        current = vectors["net_current"]
+        current[~self.active] = 0.0
+        return current
+
+    def _deactivate(self, outside: np.ndarray) -> None:
+        left = self.active & outside
+        if left.any():
+            self.active &= ~outside
+            self.velocity[left] = 0.0
+            logger.warning({"message": f"{int(left.sum())} victims left the environment bounds and were deactivated.", "event": "victim_ensemble_bounds_exit", "data": {"ids": self.ids[left].tolist()}})
+
+    def _advance(self, y: np.ndarray, elapsed: float) -> None:
+        self._set_state(y)
+        self._record(self.lat, self.lon, elapsed)
+
+    def _record(self, lat: np.ndarray, lon: np.ndarray, elapsed: float) -> None:
+        self.elapsed = elapsed
+        if self.trajectory is not None:
+            self.trajectory.Record(lat, lon, elapsed)
+
+    def Reset(self, members: np.ndarray, lat: np.ndarray, lon: np.ndarray) -> None:
+        """
+        Restarts some members at new positions, moving with the surface current there, as at construction.
+        The other members are left untouched.
+
+        :param members: Boolean mask or index array of the members to restart.
+        :param lat: New latitude of each selected member.
+        :param lon: New longitude of each selected member.
+        """
+        index = np.flatnonzero(members) if np.asarray(members).dtype == bool else np.asarray(members)
+        self.lat[index] = lat
+        self.lon[index] = lon
+        self.start[index] = np.column_stack((self.lat[index], self.lon[index]))
+        vectors = self.env.QueryMany(self.lat[index], self.lon[index])
+        inside = vectors["in_bounds"]
+        self.active[index] = inside
+        self.velocity[index] = np.where(inside[:, None], vectors["net_current"], 0.0)
+
+    def F(self, v_rel: np.ndarray) -> np.ndarray:
+        """
+        Net force on every member. Drive and drag share the same form, so they collapse to one term.
+
+        :param v_rel: (N, 2) water velocity relative to each victim.
+        :return: (N, 2) net force.
+        """
+        speed = np.sqrt(np.einsum("ij,ij->i", v_rel, v_rel))
+        return ((1.0 - self.drag_coeff) * self.rho_water * self.csa * speed)[:, None] * v_rel
+
+    def A(self, F: np.ndarray) -> np.ndarray:
+        return F / self.mass[:, None]
+
+    def V(self, A: np.ndarray) -> np.ndarray:
+        return self.velocity + (A*self.dt)
+
+    def X(self, V: np.ndarray):
+        d_lat = (V[:, 1] * self.dt) / self.earth_rad*(180/np.pi)
+        d_lon = (V[:, 0] * self.dt) / (self.earth_rad*np.cos(np.radians(self.lat)))*(180/np.pi)
+        return self.lat+d_lat, self.lon+d_lon
+
+    def Forcing(self, lat: np.ndarray, lon: np.ndarray, vel: np.ndarray):
+        """
+        Water velocity and drag rate at arbitrary member states, for the integrators in 'Integrators'.
+        The acceleration is c * (w - vel), the same force as F() divided by mass.
+        Inactive members, and states outside the bounds, get no force.
+
+        :return: Tuple of (w, c): (N, 2) water velocity and (N,) drag rate in 1/s.
+        """
+        vectors = self.env.QueryMany(lat, lon)
+        w = vectors["net_current"]
+        unforced = ~(self.active & vectors["in_bounds"])
+        w[unforced] = vel[unforced]
+        v_rel = w - vel
+        speed = np.sqrt(np.einsum("ij,ij->i", v_rel, v_rel))
+        return w, (1.0 - self.drag_coeff) * self.rho_water * self.csa * speed / self.mass
+
+    def PositionRate(self, lat: np.ndarray, vel: np.ndarray):
+        """
+        :return: Tuple of (dlat/dt, dlon/dt), in degrees per second.
+        """
+        d_lat = vel[:, 1] / self.earth_rad*(180/np.pi)
+        d_lon = vel[:, 0] / (self.earth_rad*np.cos(np.radians(lat)))*(180/np.pi)
+        return d_lat, d_lon
+
+    def Derivative(self, y: np.ndarray) -> np.ndarray:
+        """
+        :param y: (N, 4) state of [lat, lon, u, v].
+        :return: (N, 4) time derivative of the state.
+        """
+        w, c = self.Forcing(y[:, 0], y[:, 1], y[:, 2:])
+        d_lat, d_lon = self.PositionRate(y[:, 0], y[:, 2:])
+        return np.column_stack((d_lat, d_lon, c[:, None] * (w - y[:, 2:])))
+
+    def Metric(self, y: np.ndarray) -> np.ndarray:
+        """
+        :return: (N, 4) factors converting each state component to meters or m/s.
+        """
+        m_per_deg = self.earth_rad*np.pi/180
+        return np.column_stack((np.full(y.shape[0], m_per_deg), m_per_deg*np.cos(np.radians(y[:, 0])), np.ones((y.shape[0], 2))))
+
+    def State(self) -> np.ndarray:
+        """
+        :return: (N, 4) state of [lat, lon, u, v].
+        """
+        return np.column_stack((self.lat, self.lon, self.velocity))
+
+    def _set_state(self, y: np.ndarray) -> None:
+        self.lat, self.lon = y[:, 0].copy(), y[:, 1].copy()
+        self.velocity = y[:, 2:].copy()
+        self._deactivate(~self.env.InBounds(self.lat, self.lon))
+
+    def Positions(self) -> np.ndarray:
+        """
+        :return: (N, 2) array of current (lat, lon) positions.
+        """
+        return np.column_stack((self.lat, self.lon))
+
+    @property
+    def path(self) -> np.ndarray:
+        """Recorded positions, as an array of shape (rows, N, 2)."""
+        if self.trajectory is None:
+            raise ValueError("Error: This ensemble does not record its trajectory.")
+        return self.trajectory.Array()
+
+    @property
+    def path_times(self) -> np.ndarray:
+        """Time of each row of 'path', in seconds since the ensemble was created."""
+        if self.trajectory is None:
+            raise ValueError("Error: This ensemble does not record its trajectory.")
+        return self.trajectory.Times()
+
+    def Displacement(self) -> np.ndarray:
+        """
+        Calculate net displacement (in meters) of every member from its starting position.
+        Uses Haversine Formula.
+        """
+        lat1, lon1 = np.radians(self.start[:, 0]), np.radians(self.start[:, 1])
+        lat2, lon2 = np.radians(self.lat), np.radians(self.lon)
+
+        a = np.sin((lat2-lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2-lon1) / 2)**2
+        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+        return self.earth_rad*c # Distance in meters
+
+    def Update(self, step: int = -1):
+        steps = self._simulation_steps()
+
+        if self.integrator == "euler":
+            for _ in range(steps):
+                v_rel = self._current_vectors() - self.velocity
+                self.velocity = self.V(self.A(self.F(v_rel)))
+                self.lat, self.lon = self.X(self.velocity)
+                self._record(self.lat, self.lon, self.elapsed + self.dt)
+            queries = steps
+        else:
+            start = self.elapsed
+            queries = Integrators.advance(self, self.settings, self.dt, steps, lambda t, y: self._advance(y, start + t))
+
+        logger.debug(lazy(lambda: {"step": step, "event": "victim_ensemble_update", "data": {"count": len(self), "active": int(self.active.sum()), "integrator": self.integrator, "queries": queries, "mean_displacement": float(self.Displacement().mean())}}))
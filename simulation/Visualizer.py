@@ -1,3 +1,4 @@
+from contextlib import ExitStack
 from typing import Optional
 import matplotlib.pyplot as plt
 import matplotlib.animation as anim
@@ -26,6 +27,10 @@ class Visualizer:
         self.fig, self.ax = plt.subplots(figsize=(10,8), subplot_kw={'projection': ccrs.PlateCarree()})
         self.ax.coastlines()
         self.ax.add_feature(cfeature.LAND, facecolor='lightgray')
+        # The animation renders each frame after 'update' returns. The "draw" phase runs from there to the canvas'
+        # draw_event, which is emitted once the frame is rendered.
+        self._rendering = ExitStack()
+        self.fig.canvas.mpl_connect("draw_event", self._rendered)
 
         logger.info({"message": "\033[32mVisualizer initialized.\033[0m", "event":"visualizer_object_created"})
 
@@ -63,8 +68,18 @@ class Visualizer:
 
         self.fig.colorbar(self.depth_contour, ax=self.ax, label='Depth (m)')
 
+    def _rendered(self, event=None) -> None:
+        self._rendering.close()
+
     def update(self, frame):
+        self._rendered()  # In case the previous frame was never rendered.
         self.sim.Tick()
+        with self.sim.profiler.Phase("artists"):
+            artists = self._update_artists(frame)
+        self._rendering.enter_context(self.sim.profiler.Phase("draw"))
+        return artists
+
+    def _update_artists(self, frame):
         env = self.sim.env
 
         uo, vo = env.current_data.uo.values, env.current_data.vo.values
@@ -86,8 +101,7 @@ class Visualizer:
         self.winds.set_UVC(uw_grid, vw_grid)
 
         # Update victims
-        victim_lats = [v.lat for v in self.sim.victims]
-        victim_lons = [v.lon for v in self.sim.victims]
+        victim_lats, victim_lons = self.sim.Positions()
         self.victims.set_offsets(np.c_[victim_lons, victim_lats])
 
         # Update title
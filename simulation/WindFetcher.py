@@ -1,7 +1,8 @@
 from application.config import Config
+from .DatasetCache import DatasetCache
 
-import copernicusmarine
 import os
+import numpy as np
 from datetime import datetime
 import xarray as xr
 
@@ -15,7 +16,8 @@ class WindFetcher:
 
         :param config_path: Path to the configuration file.
         """
-        self.c = Config(config_path)
+        self.c = Config.shared(config_path)
+        self.cache = DatasetCache(config_path)
 
         data_subdir = self.c.get_value("application.data.storage")
         root_path = self.c.get_value("application.settings.project_dir")
@@ -32,50 +34,18 @@ class WindFetcher:
         
     def ValidDataset_p(self) -> bool:
         """
-        Checks whether the stored dataset is valid based on expiration and existence.
+        Checks whether the stored dataset exists, covers the configured region, time range and variables, and has not expired.
+        Decided from the cache manifest, see 'DatasetCache.Valid'.
 
         :return: True if dataset is valid, False otherwise.
         """
-        path = os.path.join(self.data_dir, self.data_file)
-        if not isinstance(datetime.strptime(self.data_updated, '%Y-%m-%dT%H:%M:%S'), datetime):
-            return False
-        if os.path.exists(path):
-            last_updated = datetime.strptime(self.data_updated, '%Y-%m-%dT%H:%M:%S')
-            now = datetime.now()
-            diff = now - last_updated
-            days = diff.days
-            if days > int(self.data_expiration):
-                return False
-            return True
-        else:
-            return False
+        return self.cache.Valid("wind")
 
     def FetchDataset(self) -> None:
         """
-        Fetches the dataset from the Copernicus Marine service and updates metadata.
+        Fetches the dataset from the Copernicus Marine service and records it in the cache manifest.
         """
-        path = os.path.join(self.data_dir, self.data_file)
-        if os.path.exists(path):
-            os.remove(path)
-
-        dataset_start = datetime.strptime(self.c.get_value("application.data.time_range_start"), '%Y-%m-%dT%H:%M:%S').isoformat()
-        dataset_end = datetime.strptime(self.c.get_value("application.data.time_range_end"), '%Y-%m-%dT%H:%M:%S').isoformat()
-        
-        copernicusmarine.subset(
-            username = self.c.get_value("application.settings.copernicus_username"),
-            password = self.c.get_value("application.settings.copernicus_password"),
-            dataset_id = self.c.get_value("application.data.wind.ID"),
-            variables = ["eastward_wind", "northward_wind", "eastward_stress", "northward_stress", "wind_divergence", "wind_curl"],
-            start_datetime = dataset_start,
-            end_datetime = dataset_end,
-            minimum_latitude = float(self.c.get_value("environment.settings.latitude_min")),
-            maximum_latitude = float(self.c.get_value("environment.settings.latitude_max")),
-            minimum_longitude = float(self.c.get_value("environment.settings.longitude_min")),
-            maximum_longitude = float(self.c.get_value("environment.settings.longitude_max")),
-            output_filename = self.data_file,
-            output_directory = self.data_dir
-            )
-        self.c.set_value("application.data.wind.updated", datetime.now().strftime('%Y-%m-%dT%H:%M:%S'))
+        self.cache.Fetch("wind")
 
     def LoadDataset(self):
         """
@@ -117,3 +87,38 @@ class WindFetcher:
             return wind_data
         except KeyError as e:
             raise ValueError(f"Error: Could not find data for the supplied parameters: {e}")
+
+    def WindDataRange(self, start: datetime, end: datetime, min_lat: float, max_lat: float, min_lon: float, max_lon: float):
+        """
+        Retrieves wind data for a time range and geographical bounds.
+
+        The range is widened to the records on either side of 'start' and 'end', so that every time
+        inside it can be interpolated between two records.
+
+        :param start: Start of the time range.
+        :param end: End of the time range.
+        :param min_lat: Minimum latitude.
+        :param max_lat: Maximum latitude.
+        :param min_lon: Minimum longitude.
+        :param max_lon: Maximum longitude.
+        :return: Wind data with a time dimension, within the specified bounds.
+        :raises ValueError: If dataset is not loaded or if the requested data is unavailable.
+        """
+        if self.data_full is None:
+            raise ValueError("Error: Dataset not loaded. Call 'LoadDataset()' first.")
+
+        times = self.data_full.time.values
+        first = max(int(np.searchsorted(times, np.datetime64(start), side="right")) - 1, 0)
+        last = min(int(np.searchsorted(times, np.datetime64(end), side="left")) + 1, len(times))
+
+        try:
+            wind_data = self.data_full.isel(
+                time=slice(first, last)
+            ).sel(
+                latitude=slice(min_lat, max_lat),
+                longitude=slice(min_lon, max_lon)
+            )
+
+            return wind_data
+        except KeyError as e:
+            raise ValueError(f"Error: Could not find data for the supplied parameters: {e}")
@@ -0,0 +1,45 @@
+"""
+Checks that BatchRunner returns each scenario's own path when trajectories are spilled to disk.
+
+Every scenario's ensemble numbers its victims from 1, so spill directories named only by victim IDs are shared by all
+scenarios. Two scenarios with different seeds are run on synthetic data (see benchmarks/SyntheticData.py) on two
+workers, with 'environment.settings.trajectory_directory' set and a chunk size small enough to spill, and compared
+with the same scenarios run in memory on one worker.
+Run from the project root: python tests/BatchSpill.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.SyntheticData import settings_copy, working_directory, write_datasets
+
+START = datetime(2023, 1, 1)
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as project, working_directory(project):
+        config_path = write_datasets(project, days=1, start=START)
+        overrides = {"application.logging.level": "WARNING", "environment.settings.default_window_margin": 20, "environment.settings.trajectory_chunk_size": 100}
+        spill_path = settings_copy(config_path, dict(overrides, **{"environment.settings.trajectory_directory": os.path.join(project, "trajectories")}))
+        memory_path = settings_copy(config_path, dict(overrides, **{"environment.settings.trajectory_directory": ""}))
+
+        from simulation.BatchRunner import BatchRunner
+
+        victims = {"N": 3, "range_miles": 2, "perturb_lat": True, "perturb_lon": True}
+        scenarios = BatchRunner.Scenarios(2, 30.0, -78.0, START, timedelta(minutes=20), victims=victims, range_miles=5, seed=7)
+        spilled = BatchRunner(spill_path, workers=2).Run(scenarios)
+        memory = BatchRunner(memory_path, workers=1).Run(scenarios)
+
+        batches = os.listdir(os.path.join(project, "trajectories"))
+        assert len(batches) == 1, "A batch should spill into one directory."
+        assert sorted(os.listdir(os.path.join(project, "trajectories", batches[0]))) == ["scenario_00000", "scenario_00001"], "Each scenario should spill into its own directory."
+        for name in ("path_lat", "path_lon"):
+            difference = float(np.nanmax(np.abs(spilled[name].values - memory[name].values)))
+            print(f"{name}: largest difference from the in-memory run {difference:.2e} degrees")
+            assert difference == 0.0, "Spilled paths should match the in-memory run."
+        assert not np.allclose(memory["path_lat"].values[0], memory["path_lat"].values[1]), "Scenarios should differ."
+    print("Spilled batch paths match.")
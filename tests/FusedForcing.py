@@ -0,0 +1,77 @@
+"""
+Checks the fused forcing slab of ForcingWindow against sampling current and wind on their own grids.
+
+Synthetic current (1/12 degree, daily) and wind (0.125 degree, hourly) are fused, then sampled at random points and
+times inside the window, and compared to sampling each field on its own grid:
+- Current keeps its own grid and times in the fused slab, so it matches to float32 rounding.
+- Wind is interpolated bilinearly onto the current grid, then bilinearly again by the sampler. This reproduces a
+  field that is bilinear in latitude and longitude to float32 rounding, but smooths anything else: for the synthetic
+  wind, whose gusts vary independently at every grid point, it is only expected to match within a tolerance that
+  scales with the change between neighbouring wind grid points.
+Run from the project root: python tests/FusedForcing.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+import numpy as np
+import xarray as xr
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.SyntheticData import working_directory, write_datasets
+
+START = datetime(2023, 1, 1)
+POINTS = 20000
+ROUNDING = 1e-5            # m/s, float32 rounding of values up to about 10 m/s.
+MEAN_WIND_TOLERANCE = 0.1  # m/s
+GRID_FRACTION = 0.5        # Largest wind error, as a fraction of the largest change between neighbouring wind points.
+
+
+def differences(fused, native, t: float, lats: np.ndarray, lons: np.ndarray, components: slice) -> np.ndarray:
+    """
+    :return: Absolute difference of the fused components from the native field, at the points where the native field is defined.
+    """
+    expected = native.Sample(t, lats, lons)
+    defined = np.isfinite(expected).all(axis=1)
+    return np.abs(fused.Sample(t, lats, lons)[defined, components] - expected[defined])
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as project, working_directory(project):
+        from simulation.DatasetCache import DatasetCache
+        from simulation.ForcingWindow import FieldSlab, ForcingWindow
+        from simulation.GridSampler import create_sampler
+
+        cache = DatasetCache(write_datasets(project, days=1, start=START, lat_range=(29.0, 31.0), lon_range=(-80.0, -77.0)))
+        with xr.open_dataset(cache.Path("current")) as data:
+            current = FieldSlab.FromDataset(data.isel(depth=0), ("uo", "vo"))
+        with xr.open_dataset(cache.Path("wind")) as data:
+            wind = FieldSlab.FromDataset(data, ("eastward_wind", "northward_wind"))
+        lat_grid, lon_grid = np.meshgrid(wind.lats - 30, wind.lons + 78, indexing="ij")
+        bilinear = np.stack((3 + 0.8*lat_grid - 1.2*lon_grid + 0.5*lat_grid*lon_grid, -2 + 0.3*lat_grid), axis=-1)
+        bilinear_wind = FieldSlab(wind.times, wind.lats, wind.lons, np.broadcast_to(bilinear, wind.values.shape), wind.names)
+
+        rng = np.random.default_rng(0)
+        lats = rng.uniform(current.lats.min(), current.lats.max(), POINTS)
+        lons = rng.uniform(current.lons.min(), current.lons.max(), POINTS)
+        times = rng.uniform(current.times[0], current.times[-1], 10)
+        native_current = create_sampler(current.times, current.lats, current.lons, current.values)
+        errors = {}
+        for name, slab in (("synthetic", wind), ("bilinear", bilinear_wind)):
+            forcing = ForcingWindow.Fuse(current, slab)
+            fused = create_sampler(forcing.times, forcing.lats, forcing.lons, forcing.values)
+            native_wind = create_sampler(slab.times, slab.lats, slab.lons, slab.values)
+            errors[name] = np.concatenate([differences(fused, native_wind, t, lats, lons, slice(2, 4)) for t in times])
+            errors[f"{name} current"] = np.concatenate([differences(fused, native_current, t, lats, lons, slice(0, 2)) for t in times])
+
+        grid_change = max(np.abs(np.diff(wind.values, axis=1)).max(), np.abs(np.diff(wind.values, axis=2)).max())
+        print(f"Synthetic wind: mean difference {errors['synthetic'].mean():.3f} m/s, largest {errors['synthetic'].max():.3f} m/s, "
+              f"largest change between neighbouring grid points {grid_change:.3f} m/s")
+        print(f"Bilinear wind: largest difference {errors['bilinear'].max():.2e} m/s")
+        print(f"Current: largest difference {max(errors['synthetic current'].max(), errors['bilinear current'].max()):.2e} m/s")
+        assert errors["bilinear"].max() < ROUNDING, "A bilinear wind field should be reproduced to float32 rounding."
+        assert errors["synthetic"].mean() < MEAN_WIND_TOLERANCE, "Regridded wind is further from the native wind than expected."
+        assert errors["synthetic"].max() < GRID_FRACTION * grid_change, "Regridded wind is further from the native wind than expected."
+        assert errors["synthetic current"].max() < ROUNDING and errors["bilinear current"].max() < ROUNDING, "Fused current differs from the current on its own grid."
+    print("Fused forcing matches native sampling within tolerance.")
@@ -0,0 +1,79 @@
+"""
+Checks concurrent dataset downloads against a fake 'copernicusmarine.subset'.
+
+The fake writes a small NetCDF file covering the requested box and time range after a one second delay, and fails
+the first wind request. All three datasets are downloaded into a temporary project directory, then the current
+dataset ID is changed, which must invalidate the cached current file.
+Run from the project root: python tests/Prefetch.py
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.SyntheticData import settings_copy
+from simulation.DatasetCache import DatasetCache
+
+DELAY = 1.0
+
+
+class FakeSubset:
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, **kwargs):
+        with self.lock:
+            self.calls.append(kwargs["dataset_id"])
+            first_wind = kwargs["variables"][0] == "eastward_wind" and self.calls.count(kwargs["dataset_id"]) == 1
+        time.sleep(DELAY)
+        if first_wind:
+            raise ConnectionError("Simulated network failure.")
+
+        lats = np.arange(kwargs["minimum_latitude"], kwargs["maximum_latitude"] + 0.01, 0.5)
+        lons = np.arange(kwargs["minimum_longitude"], kwargs["maximum_longitude"] + 0.01, 0.5)
+        times = pd.date_range(kwargs["start_datetime"], kwargs["end_datetime"], freq="1D")
+        if "deptho" in kwargs["variables"]:
+            data = xr.Dataset({v: (("latitude", "longitude"), np.ones((lats.size, lons.size))) for v in kwargs["variables"]}, coords={"latitude": lats, "longitude": lons})
+        else:
+            data = xr.Dataset({v: (("time", "latitude", "longitude"), np.zeros((times.size, lats.size, lons.size))) for v in kwargs["variables"]}, coords={"time": times, "latitude": lats, "longitude": lons})
+        data.to_netcdf(os.path.join(kwargs["output_directory"], kwargs["output_filename"]))
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as project:
+        config_path = settings_copy(os.path.join(ROOT, "resources", "settings.json"), {"application.settings.project_dir": project, "application.data.download_backoff_seconds": 0.1}, project)
+
+        cache = DatasetCache(config_path)
+        subset = FakeSubset()
+        start = time.time()
+        entries = cache.Prefetch(subset=subset)
+        elapsed = time.time() - start
+        print(f"Downloaded {sorted(entries)} in {elapsed:.2f} s, {len(subset.calls)} subset calls.")
+
+        assert sorted(entries) == ["current", "depth", "wind"], "Every dataset should be downloaded."
+        assert len(subset.calls) == 4, "The failed wind download should be retried once."
+        assert elapsed < 3 * DELAY, "Downloads should run concurrently."
+        assert all(cache.Valid(name) for name in entries), "Downloaded datasets should be valid."
+        assert not [f for f in os.listdir(cache.data_dir) if f.startswith(".")], "Temporary download directories should be removed."
+        with open(config_path) as file:
+            updated = json.load(file)["application"]["data"]
+        assert all(updated[name]["updated"] == entries[name]["updated"] for name in entries), "Download dates should be saved to the configuration."
+        assert cache.Prefetch(subset=subset) == {}, "Valid datasets should not be downloaded again."
+
+        cache.c.set_value("application.data.current.ID", "other_current_product")
+        assert not cache.Valid("current"), "A file of another dataset ID should not be valid."
+        assert cache.Valid("wind") and cache.Valid("depth"), "Other datasets should stay valid."
+        entries = cache.Prefetch(subset=subset)
+        assert sorted(entries) == ["current"], "Only the current dataset should be downloaded again."
+        assert subset.calls[-1] == "other_current_product", "The new dataset ID should be downloaded."
+        assert cache.Valid("current"), "The new download should be valid."
+        assert "copernicusmarine" not in sys.modules, "The Copernicus client should not be imported."
+    print("Concurrent prefetch works.")
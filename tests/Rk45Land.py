@@ -0,0 +1,59 @@
+"""
+Checks the 'rk45' integrator with one ensemble member on a land cell, where the current is NaN.
+
+An ensemble of three victims drifts in a uniform, constant current with a box of NaN current, one of them starting
+inside it. The member on land should hold its position, and the others should drift as they do in an ensemble
+without it, instead of the NaN shrinking the shared step size until the integrator gives up.
+Run from the project root: python tests/Rk45Land.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.SyntheticData import settings_copy, uniform_window, working_directory
+
+CURRENT = (0.3, 0.1)
+CENTER = (30.0, -80.0)
+LAND = (29.7, 29.9, -80.3, -80.1)
+START = datetime(2023, 1, 1)
+TICKS = 3
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as project, working_directory(project):
+        from application.logger import Logger
+        from simulation.Environment import Environment
+        from simulation.VictimEnsemble import VictimEnsemble
+        Logger.configure("WARNING")
+
+        config = settings_copy(os.path.join(ROOT, "resources", "settings.json"), {
+            "application.settings.project_dir": project, "application.logging.level": "WARNING", "environment.settings.integrator": "rk45",
+            "environment.settings.victim_timedelta_seconds": 30, "environment.settings.simulation_timedelta_minutes": 10}, project)
+        end = START + timedelta(minutes=10 * TICKS)
+        window = uniform_window(CENTER, START, end, CURRENT, land=LAND)
+        lats = np.array([30.1, 29.8, 30.2])
+        lons = np.array([-80.0, -80.2, -79.9])
+        assert np.isnan(window.current.values[0, 21:23, 21:23]).all(), "The second member should start inside the land box."
+
+        positions = {}
+        for name, members in (("with land", [0, 1, 2]), ("without land", [0, 2])):
+            env = Environment(*CENTER, config, date=START, end_date=end, window=window)
+            n = len(members)
+            ensemble = VictimEnsemble(np.full(n, 0.5), np.full(n, 0.5), np.ones(n), lats[members], lons[members], ["piw"] * n, env, config, record=False)
+            ensemble.velocity[:] = 0.0
+            for step in range(1, TICKS + 1):
+                env.Update(START + timedelta(minutes=10 * step))
+                ensemble.Update(step)
+            positions[name] = ensemble.Positions()
+
+        land, water = positions["with land"], positions["without land"]
+        print(f"Member on land moved {np.abs(land[1] - (lats[1], lons[1])).max():.2e} degrees; others differ by {np.abs(land[[0, 2]] - water).max():.2e} degrees")
+        assert np.isfinite(land).all(), "No member should become NaN."
+        assert np.array_equal(land[1], (lats[1], lons[1])), "The member on land should hold its position."
+        assert np.allclose(land[[0, 2]], water, rtol=0, atol=1e-12), "Members in the water should not be affected by the member on land."
+        assert (np.abs(water - np.column_stack((lats[[0, 2]], lons[[0, 2]]))) > 1e-3).all(), "Members in the water should drift."
+    print("rk45 holds members on NaN cells.")